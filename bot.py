@@ -5,13 +5,48 @@ from telegram.ext import Application
 from config import config
 from handlers import register_handlers
 from rss import setup as setup_rss
+from rss.fetcher import feed_fetcher
+from rss.parser import feed_parser_pool
+from rss import data_manager as rss_data_manager
 from database.db_manager import DatabaseManager
+from database.write_queue import write_queue
+from database import models as db
+from utils.update_processor import OrderedUpdateProcessor
+from services.ingress_queue import ingress_queue
+from services.settings import bot_settings
+from services.verdict_cache import verdict_cache
+from services.image_hash import image_index
+from services.prefilter import spam_prefilter
+from services.challenge_pool import challenge_pool
 
 async def post_init(app: Application):
     config.BOT_ID = app.bot.id
     config.BOT_USERNAME = app.bot.username
     print(f"Bot ID: {config.BOT_ID} 已设置")
     print(f"Bot Username: {config.BOT_USERNAME} 已设置")
+    await DatabaseManager().open_pool()
+    thread_count = await db.warm_thread_index()
+    logging.info(f"话题索引已加载 {thread_count} 个话题。")
+    knowledge_count = await db.warm_knowledge_index()
+    logging.info(f"知识库检索索引已加载 {knowledge_count} 个条目。")
+    bot_settings.on_change('queue_max_size', ingress_queue.set_max_size)
+    setting_count = await bot_settings.load()
+    logging.info(f"已加载 {setting_count} 项运行时设置。")
+    verdict_count = await verdict_cache.load()
+    logging.info(f"已从数据库恢复 {verdict_count} 条内容审查缓存。")
+    image_count = await image_index.load()
+    logging.info(f"已从数据库恢复 {image_count} 条图片感知哈希。")
+    rule_count = await spam_prefilter.load()
+    logging.info(f"本地预过滤已加载 {rule_count} 条规则。")
+    challenge_pool.start()
+
+async def post_shutdown(app: Application):
+    await challenge_pool.close()
+    await feed_fetcher.close()
+    feed_parser_pool.close()
+    rss_data_manager.flush_subscriptions()
+    await write_queue.close()
+    await DatabaseManager().close()
 
 def main():
     logging.basicConfig(
@@ -22,7 +57,14 @@ def main():
     db_manager = DatabaseManager(config.DATABASE_PATH)
     asyncio.run(db_manager.initialize())
     
-    app = Application.builder().token(config.BOT_TOKEN).post_init(post_init).build()
+    app = (
+        Application.builder()
+        .token(config.BOT_TOKEN)
+        .concurrent_updates(OrderedUpdateProcessor(config.MAX_WORKERS, config.MAX_PENDING_UPDATES, ingress_queue))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     register_handlers(app)
     setup_rss(app)
@@ -13,17 +13,58 @@ class Config:
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     ENABLE_AI_FILTER = os.getenv('ENABLE_AI_FILTER', 'true').lower() == 'true'
     AI_CONFIDENCE_THRESHOLD = int(os.getenv('AI_CONFIDENCE_THRESHOLD', '70'))
+    GEMINI_TIMEOUT_ANALYZE = float(os.getenv('GEMINI_TIMEOUT_ANALYZE', '15'))
+    GEMINI_TIMEOUT_CHALLENGE = float(os.getenv('GEMINI_TIMEOUT_CHALLENGE', '10'))
+    GEMINI_TIMEOUT_AUTOREPLY = float(os.getenv('GEMINI_TIMEOUT_AUTOREPLY', '20'))
+    GEMINI_BREAKER_THRESHOLD = int(os.getenv('GEMINI_BREAKER_THRESHOLD', '5'))
+    GEMINI_BREAKER_RECOVERY = int(os.getenv('GEMINI_BREAKER_RECOVERY', '60'))
+    GEMINI_BATCH_ENABLED = os.getenv('GEMINI_BATCH_ENABLED', 'false').lower() == 'true'
+    GEMINI_BATCH_WINDOW_MS = int(os.getenv('GEMINI_BATCH_WINDOW_MS', '300'))
+    GEMINI_BATCH_MAX_SIZE = int(os.getenv('GEMINI_BATCH_MAX_SIZE', '20'))
+    KB_RETRIEVAL_TOP_K = int(os.getenv('KB_RETRIEVAL_TOP_K', '5'))
+    AUTOREPLY_CACHE_SIZE = int(os.getenv('AUTOREPLY_CACHE_SIZE', '2000'))
+    AUTOREPLY_CACHE_TTL = int(os.getenv('AUTOREPLY_CACHE_TTL', '86400'))
+    AUTOREPLY_STREAMING = os.getenv('AUTOREPLY_STREAMING', 'true').lower() == 'true'
+    AUTOREPLY_STREAM_EDIT_INTERVAL = float(os.getenv('AUTOREPLY_STREAM_EDIT_INTERVAL', '1.0'))
+    AUTOREPLY_STREAM_MIN_CHARS = int(os.getenv('AUTOREPLY_STREAM_MIN_CHARS', '30'))
+    VERDICT_CACHE_SIZE = int(os.getenv('VERDICT_CACHE_SIZE', '50000'))
+    VERDICT_CACHE_TTL = int(os.getenv('VERDICT_CACHE_TTL', '86400'))
+    VERDICT_CACHE_PERSIST = os.getenv('VERDICT_CACHE_PERSIST', 'true').lower() == 'true'
+    IMAGE_HASH_MAX_DISTANCE = int(os.getenv('IMAGE_HASH_MAX_DISTANCE', '8'))
+    IMAGE_HASH_INDEX_SIZE = int(os.getenv('IMAGE_HASH_INDEX_SIZE', '200000'))
+    PREFILTER_SAFE_MAX_LENGTH = int(os.getenv('PREFILTER_SAFE_MAX_LENGTH', '20'))
+    PREFILTER_REPEAT_WINDOW = int(os.getenv('PREFILTER_REPEAT_WINDOW', '600'))
+    PREFILTER_REPEAT_USERS = int(os.getenv('PREFILTER_REPEAT_USERS', '3'))
+    PREFILTER_REPEAT_MIN_LENGTH = int(os.getenv('PREFILTER_REPEAT_MIN_LENGTH', '15'))
+    PREFILTER_STYLED_RATIO = float(os.getenv('PREFILTER_STYLED_RATIO', '0.3'))
     
     VERIFICATION_ENABLED = os.getenv('VERIFICATION_ENABLED', 'true').lower() == 'true'
     AUTO_UNBLOCK_ENABLED = os.getenv('AUTO_UNBLOCK_ENABLED', 'true').lower() == 'true'
     
     DATABASE_PATH = os.getenv('DATABASE_PATH', './data/bot.db')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+    DB_JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+    DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+    DB_CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', '-16000'))
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', '134217728'))
+    DB_TEMP_STORE = os.getenv('DB_TEMP_STORE', 'MEMORY')
+    DB_BUSY_TIMEOUT = int(os.getenv('DB_BUSY_TIMEOUT', '5000'))
+    DB_WRITE_BATCH_SIZE = int(os.getenv('DB_WRITE_BATCH_SIZE', '100'))
+    DB_WRITE_FLUSH_MS = int(os.getenv('DB_WRITE_FLUSH_MS', '200'))
+    DB_WRITE_QUEUE_SIZE = int(os.getenv('DB_WRITE_QUEUE_SIZE', '10000'))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '600'))
     
     MAX_WORKERS = int(os.getenv('MAX_WORKERS', '5'))
+    MAX_PENDING_UPDATES = int(os.getenv('MAX_PENDING_UPDATES', '2000'))
     QUEUE_TIMEOUT = int(os.getenv('QUEUE_TIMEOUT', '30'))
     
     VERIFICATION_TIMEOUT = int(os.getenv('VERIFICATION_TIMEOUT', '300'))
     MAX_VERIFICATION_ATTEMPTS = int(os.getenv('MAX_VERIFICATION_ATTEMPTS', '3'))
+    CHALLENGE_POOL_SIZE = int(os.getenv('CHALLENGE_POOL_SIZE', '50'))
+    CHALLENGE_POOL_LOW_WATERMARK = int(os.getenv('CHALLENGE_POOL_LOW_WATERMARK', '20'))
+    CHALLENGE_POOL_REFILL_INTERVAL = int(os.getenv('CHALLENGE_POOL_REFILL_INTERVAL', '30'))
+    CHALLENGE_POOL_CONCURRENCY = int(os.getenv('CHALLENGE_POOL_CONCURRENCY', '3'))
     
     MAX_MESSAGES_PER_MINUTE = int(os.getenv('MAX_MESSAGES_PER_MINUTE', '30'))
 
@@ -33,6 +74,12 @@ class Config:
     RSS_AUTHORIZED_USER_IDS = [
         int(user_id) for user_id in os.getenv('RSS_AUTHORIZED_USER_IDS', '').split(',') if user_id
     ]
+    RSS_FETCH_TIMEOUT = float(os.getenv('RSS_FETCH_TIMEOUT', '20'))
+    RSS_FETCH_MAX_BYTES = int(os.getenv('RSS_FETCH_MAX_BYTES', str(5 * 1024 * 1024)))
+    RSS_FETCH_CONCURRENCY = int(os.getenv('RSS_FETCH_CONCURRENCY', '20'))
+    RSS_FETCH_PER_HOST = int(os.getenv('RSS_FETCH_PER_HOST', '2'))
+    RSS_PARSE_WORKERS = int(os.getenv('RSS_PARSE_WORKERS', '0'))
+    RSS_SAVE_DELAY = float(os.getenv('RSS_SAVE_DELAY', '5'))
     
     @classmethod
     def validate(cls):
@@ -1,26 +1,131 @@
 import aiosqlite
+import asyncio
 import os
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
+from config import config
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+TEMP_STORE_MODES = {'DEFAULT', 'FILE', 'MEMORY'}
+
+REPORTED_PRAGMAS = ['journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout']
+PRAGMA_VALUE_NAMES = {
+    'synchronous': {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'},
+    'temp_store': {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'},
+}
+
+def _choice(value: str, allowed: set, default: str) -> str:
+    value = (value or '').upper()
+    if value not in allowed:
+        logging.warning(f"无效的 SQLite 设置值 {value!r}，回退为 {default}。")
+        return default
+    return value
 
 class DatabaseManager:
     _instance = None
 
-    def __new__(cls, db_path='./data/bot.db'):
+    def __new__(cls, db_path=None, pool_size=None):
         if cls._instance is None:
             cls._instance = super(DatabaseManager, cls).__new__(cls)
-            cls._instance.db_path = db_path
+            cls._instance.db_path = db_path or config.DATABASE_PATH
+            cls._instance.pool_size = max(1, pool_size or config.DB_POOL_SIZE)
+            cls._instance._writer = None
+            cls._instance._readers = None
+            cls._instance._reader_connections = []
+            cls._instance._pool_lock = asyncio.Lock()
+            cls._instance._write_lock = asyncio.Lock()
             cls._instance.ensure_data_directory()
         return cls._instance
 
     def ensure_data_directory(self):
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
 
-    def get_connection(self):
-        return aiosqlite.connect(self.db_path)
+    def get_tuning_profile(self) -> dict:
+        return {
+            'journal_mode': _choice(config.DB_JOURNAL_MODE, JOURNAL_MODES, 'WAL'),
+            'synchronous': _choice(config.DB_SYNCHRONOUS, SYNCHRONOUS_MODES, 'NORMAL'),
+            'cache_size': int(config.DB_CACHE_SIZE),
+            'mmap_size': max(0, int(config.DB_MMAP_SIZE)),
+            'temp_store': _choice(config.DB_TEMP_STORE, TEMP_STORE_MODES, 'MEMORY'),
+            'busy_timeout': max(0, int(config.DB_BUSY_TIMEOUT)),
+        }
+
+    async def apply_tuning(self, db):
+        for pragma, value in self.get_tuning_profile().items():
+            await db.execute(f'PRAGMA {pragma} = {value}')
+
+    async def _open_connection(self):
+        conn = await aiosqlite.connect(self.db_path)
+        await self.apply_tuning(conn)
+        return conn
+
+    async def get_pragma_report(self) -> dict:
+        report = {}
+        async with self.get_read_connection() as db:
+            for pragma in REPORTED_PRAGMAS:
+                async with db.execute(f'PRAGMA {pragma}') as cursor:
+                    row = await cursor.fetchone()
+                    value = row[0] if row else None
+                    report[pragma] = PRAGMA_VALUE_NAMES.get(pragma, {}).get(value, value)
+        return report
+
+    async def open_pool(self):
+        async with self._pool_lock:
+            if self._writer is not None:
+                return
+            readers = asyncio.Queue()
+            reader_connections = []
+            for _ in range(self.pool_size):
+                conn = await self._open_connection()
+                reader_connections.append(conn)
+                readers.put_nowait(conn)
+            self._readers = readers
+            self._reader_connections = reader_connections
+            self._writer = await self._open_connection()
+        logging.info(f"数据库连接池已就绪：1 个写连接，{self.pool_size} 个读连接。")
+
+    async def _ensure_pool(self):
+        if self._writer is None:
+            await self.open_pool()
+
+    @asynccontextmanager
+    async def get_read_connection(self):
+        await self._ensure_pool()
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def get_write_connection(self):
+        await self._ensure_pool()
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    async def close(self):
+        async with self._pool_lock:
+            if self._writer is None:
+                return
+            async with self._write_lock:
+                await self._writer.close()
+                self._writer = None
+            for _ in range(len(self._reader_connections)):
+                conn = await self._readers.get()
+                await conn.close()
+            self._readers = None
+            self._reader_connections = []
+        logging.info("数据库连接池已关闭。")
 
     async def initialize(self):
-        async with self.get_connection() as db:
+        async with aiosqlite.connect(self.db_path) as db:
+            await self.apply_tuning(db)
             await self.create_users_table(db)
             await self.create_messages_table(db)
             await self.create_blacklist_table(db)
@@ -31,9 +136,13 @@ class DatabaseManager:
             await self.create_filtered_messages_table(db)
             await self.create_knowledge_base_table(db)
             await self.create_exemptions_table(db)
+            await self.create_verdict_cache_table(db)
+            await self.create_image_hashes_table(db)
+            await self.create_prefilter_rules_table(db)
             await self.migrate_database(db)
             await db.commit()
-        logging.info("数据库初始化完成。")
+        profile = ', '.join(f"{key}={value}" for key, value in self.get_tuning_profile().items())
+        logging.info(f"数据库初始化完成。SQLite 调优参数: {profile}")
 
     async def create_users_table(self, db):
         await db.execute('''
@@ -71,6 +180,7 @@ class DatabaseManager:
                 direction TEXT NOT NULL,
                 is_forwarded INTEGER DEFAULT 0,
                 reply_to_message_id INTEGER,
+                forwarded_message_id INTEGER,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
             )
@@ -79,6 +189,7 @@ class DatabaseManager:
         await db.execute('CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages(thread_id)')
         await db.execute('CREATE INDEX IF NOT EXISTS idx_messages_direction ON messages(direction)')
         await db.execute('CREATE INDEX IF NOT EXISTS idx_messages_created ON messages(created_at)')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_messages_user_message ON messages(user_id, message_id)')
 
     async def create_blacklist_table(self, db):
         await db.execute('''
@@ -140,7 +251,9 @@ class DatabaseManager:
             ('verification_enabled', '1', '是否启用新用户验证 (1=是, 0=否)'),
             ('ai_filter_enabled', '1', '是否启用AI垃圾消息过滤 (1=是, 0=否)'),
             ('max_message_length', '4096', '允许接收的最大消息长度'),
-            ('queue_max_size', '1000', '内部消息处理队列的最大容量')
+            ('queue_max_size', '1000', '内部消息处理队列的最大容量'),
+            ('prefilter_enabled', '1', '是否启用本地垃圾消息预过滤 (1=是, 0=否)'),
+            ('prefilter_fast_accept', '0', '是否由本地预过滤直接放行简短的普通文本 (1=是, 0=否)')
         ]
         for key, value, description in default_settings:
             await db.execute(
@@ -210,8 +323,44 @@ class DatabaseManager:
         await db.execute('CREATE INDEX IF NOT EXISTS idx_exemptions_expires ON exemptions(expires_at)')
         await db.execute('CREATE INDEX IF NOT EXISTS idx_exemptions_permanent ON exemptions(is_permanent)')
 
+    async def create_verdict_cache_table(self, db):
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS verdict_cache (
+                content_hash TEXT PRIMARY KEY,
+                is_spam INTEGER NOT NULL,
+                reason TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_verdict_cache_created ON verdict_cache(created_at)')
+
+    async def create_image_hashes_table(self, db):
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS image_hashes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phash INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                is_spam INTEGER NOT NULL,
+                reason TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(phash, text_hash)
+            )
+        ''')
+
+    async def create_prefilter_rules_table(self, db):
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS prefilter_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                rule_type TEXT NOT NULL,
+                pattern TEXT NOT NULL,
+                created_by INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(rule_type, pattern)
+            )
+        ''')
+
     async def get_filtered_messages_by_user(self, user_id, limit=5):
-        async with self.get_connection() as db:
+        async with self.get_read_connection() as db:
             cursor = await db.execute(
                 'SELECT content, reason FROM filtered_messages WHERE user_id = ? ORDER BY filtered_at DESC LIMIT ?',
                 (user_id, limit)
@@ -234,6 +383,14 @@ class DatabaseManager:
             if "duplicate column name" not in str(e):
                 raise e
 
+        try:
+            await db.execute('ALTER TABLE messages ADD COLUMN forwarded_message_id INTEGER')
+            logging.info("数据库迁移：成功为 'messages' 表添加 'forwarded_message_id' 列。")
+        except aiosqlite.OperationalError as e:
+            if "duplicate column name" not in str(e):
+                raise e
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_messages_forwarded ON messages(forwarded_message_id)')
+
         try:
             await db.execute(
                 'INSERT OR IGNORE INTO settings (key, value, description) VALUES (?, ?, ?)',
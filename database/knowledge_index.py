@@ -0,0 +1,93 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+
+CJK_RANGES = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+TOKEN_PATTERN = re.compile(rf'[{CJK_RANGES}]+|[a-z0-9]+(?:[._-][a-z0-9]+)*')
+CJK_RUN_PATTERN = re.compile(rf'[{CJK_RANGES}]+')
+
+def tokenize(text: str) -> list:
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKC', text).casefold()
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        run = match.group()
+        if CJK_RUN_PATTERN.fullmatch(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+class KnowledgeIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75, title_weight: int = 2):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.warmed = False
+        self.version = 0
+        self._entries = {}
+        self._lengths = {}
+        self._postings = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, entries):
+        self._entries.clear()
+        self._lengths.clear()
+        self._postings.clear()
+        self._total_length = 0
+        for entry in entries:
+            self.add(entry['id'], entry['title'], entry['content'])
+        self.warmed = True
+        self.version += 1
+
+    def add(self, entry_id: int, title: str, content: str):
+        self.remove(entry_id)
+        terms = Counter(tokenize(title) * self.title_weight + tokenize(content))
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[entry_id] = frequency
+        length = sum(terms.values())
+        self._entries[entry_id] = {"id": entry_id, "title": title, "content": content}
+        self._lengths[entry_id] = length
+        self._total_length += length
+        self.version += 1
+
+    def remove(self, entry_id: int):
+        if entry_id not in self._entries:
+            return
+        for term in set(tokenize(self._entries[entry_id]['title'])) | set(tokenize(self._entries[entry_id]['content'])):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(entry_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(entry_id)
+        del self._entries[entry_id]
+        self.version += 1
+
+    def search(self, query: str, top_k: int) -> list:
+        if not self._entries:
+            return []
+        doc_count = len(self._entries)
+        average_length = self._total_length / doc_count or 1
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for entry_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[entry_id] / average_length)
+                scores[entry_id] = scores.get(entry_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self._entries[entry_id], score) for entry_id, score in ranked]
+
+    def entries(self) -> list:
+        return list(self._entries.values())
+
+knowledge_index = KnowledgeIndex()
@@ -1,45 +1,115 @@
 from datetime import datetime, timezone, timedelta
 from .db_manager import db_manager
+from .write_queue import write_queue
+from .user_cache import user_cache, thread_index
+from .knowledge_index import knowledge_index
+from utils.lru_cache import MISSING
 from config import config
 
 async def get_user(user_id: int):
-    async with db_manager.get_connection() as db:
+    cached = user_cache.get(user_id, "user")
+    if cached is not MISSING:
+        return dict(cached) if cached else None
+
+    token = user_cache.begin()
+    async with db_manager.get_read_connection() as db:
         async with db.execute(
             'SELECT * FROM users WHERE user_id = ?',
             (user_id,)
         ) as cursor:
             row = await cursor.fetchone()
-            if row:
-                return dict(zip([col[0] for col in cursor.description], row))
-            return None
+            user = dict(zip([col[0] for col in cursor.description], row)) if row else None
+    user_cache.store(user_id, "user", user, token)
+    return dict(user) if user else None
+
+async def get_user_gate(user_id: int) -> dict:
+    user = user_cache.get(user_id, "user")
+    blacklist = user_cache.get(user_id, "blacklist")
+    exemption = user_cache.get(user_id, "exemption")
+
+    if MISSING in (user, blacklist, exemption):
+        token = user_cache.begin()
+        async with db_manager.get_read_connection() as db:
+            async with db.execute('''
+                SELECT u.*,
+                       b.user_id AS gate_blacklist_user_id,
+                       b.permanent AS gate_blacklist_permanent,
+                       e.user_id AS gate_exemption_user_id,
+                       e.is_permanent AS gate_exemption_permanent,
+                       e.expires_at AS gate_exemption_expires_at
+                FROM (SELECT ? AS user_id) k
+                LEFT JOIN users u ON u.user_id = k.user_id
+                LEFT JOIN blacklist b ON b.user_id = k.user_id
+                LEFT JOIN exemptions e ON e.user_id = k.user_id
+            ''', (user_id,)) as cursor:
+                row = dict(zip([col[0] for col in cursor.description], await cursor.fetchone()))
+
+        blacklist_user_id = row.pop('gate_blacklist_user_id')
+        blacklist_permanent = row.pop('gate_blacklist_permanent')
+        exemption_user_id = row.pop('gate_exemption_user_id')
+        exemption_permanent = row.pop('gate_exemption_permanent')
+        exemption_expires_at = row.pop('gate_exemption_expires_at')
+
+        user = row if row.get('user_id') is not None else None
+        blacklist = (True, bool(blacklist_permanent)) if blacklist_user_id is not None else (False, False)
+        exemption = (bool(exemption_permanent), exemption_expires_at) if exemption_user_id is not None else None
+
+        user_cache.store(user_id, "user", user, token)
+        user_cache.store(user_id, "blacklist", blacklist, token)
+        user_cache.store(user_id, "exemption", exemption, token)
+
+    return {
+        "user": dict(user) if user else None,
+        "is_blacklisted": blacklist[0],
+        "is_permanent": blacklist[1],
+        "is_verified": bool(user and user.get('is_verified')),
+        "thread_id": user.get('thread_id') if user else None,
+        "is_exempted": _is_exemption_valid(*exemption) if exemption else False,
+    }
 
 async def add_user(user_id: int, username: str, first_name: str, last_name: str = None, language_code: str = None):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_write_connection() as db:
         await db.execute('''
             INSERT OR REPLACE INTO users
             (user_id, username, first_name, last_name, language_code, last_active)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (user_id, username, first_name, last_name, language_code, datetime.now()))
         await db.commit()
+    user_cache.invalidate(user_id)
+    thread_index.set(user_id, None)
 
 async def update_user_verification(user_id: int, is_verified: bool):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_write_connection() as db:
         await db.execute(
             'UPDATE users SET is_verified = ? WHERE user_id = ?',
             (1 if is_verified else 0, user_id)
         )
         await db.commit()
+    user_cache.invalidate(user_id)
 
 async def update_user_thread_id(user_id: int, thread_id: int):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_write_connection() as db:
         await db.execute(
             'UPDATE users SET thread_id = ? WHERE user_id = ?',
             (thread_id, user_id)
         )
         await db.commit()
+    user_cache.invalidate(user_id)
+    thread_index.set(user_id, thread_id)
+
+async def warm_thread_index():
+    async with db_manager.get_read_connection() as db:
+        async with db.execute('SELECT user_id, thread_id FROM users WHERE thread_id IS NOT NULL') as cursor:
+            rows = await cursor.fetchall()
+    thread_index.load(rows)
+    return len(thread_index)
 
 async def get_user_by_thread_id(thread_id: int):
-    async with db_manager.get_connection() as db:
+    if thread_index.warmed:
+        user_id = thread_index.user_for(thread_id)
+        return await get_user(user_id) if user_id is not None else None
+
+    async with db_manager.get_read_connection() as db:
         async with db.execute(
             'SELECT * FROM users WHERE thread_id = ?',
             (thread_id,)
@@ -49,26 +119,55 @@ async def get_user_by_thread_id(thread_id: int):
                 return dict(zip([col[0] for col in cursor.description], row))
             return None
 
-async def save_message(user_id: int, message_id: int, content: str, direction: str, media_type: str = None, media_file_id: str = None):
-    async with db_manager.get_connection() as db:
-        await db.execute('''
-            INSERT INTO messages
-            (user_id, message_id, content, direction, media_type, media_file_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, message_id, content, direction, media_type, media_file_id))
-        await db.commit()
+async def save_message(user_id: int, message_id: int, content: str, direction: str, media_type: str = None, media_file_id: str = None,
+                       thread_id: int = None, forwarded_message_id: int = None, reply_to_message_id: int = None):
+    await write_queue.enqueue('''
+        INSERT INTO messages
+        (user_id, message_id, thread_id, content, direction, media_type, media_file_id,
+         is_forwarded, forwarded_message_id, reply_to_message_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, message_id, thread_id, content, direction, media_type, media_file_id,
+          1 if forwarded_message_id else 0, forwarded_message_id, reply_to_message_id))
+
+async def get_user_chat_message_id(thread_id: int, topic_message_id: int):
+    async with db_manager.get_read_connection() as db:
+        async with db.execute('''
+            SELECT CASE WHEN direction = 'incoming' THEN message_id ELSE forwarded_message_id END
+            FROM messages
+            WHERE thread_id = ? AND (
+                (direction = 'incoming' AND forwarded_message_id = ?) OR
+                (direction = 'outgoing' AND message_id = ?)
+            )
+            ORDER BY id DESC
+            LIMIT 1
+        ''', (thread_id, topic_message_id, topic_message_id)) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else None
+
+async def get_topic_message_id(user_id: int, user_chat_message_id: int):
+    async with db_manager.get_read_connection() as db:
+        async with db.execute('''
+            SELECT CASE WHEN direction = 'outgoing' THEN message_id ELSE forwarded_message_id END
+            FROM messages
+            WHERE user_id = ? AND (
+                (direction = 'outgoing' AND forwarded_message_id = ?) OR
+                (direction = 'incoming' AND message_id = ?)
+            )
+            ORDER BY id DESC
+            LIMIT 1
+        ''', (user_id, user_chat_message_id, user_chat_message_id)) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else None
 
 async def save_filtered_message(user_id: int, message_id: int, content: str, reason: str, media_type: str = None, media_file_id: str = None):
-    async with db_manager.get_connection() as db:
-        await db.execute('''
-            INSERT INTO filtered_messages
-            (user_id, message_id, content, reason, media_type, media_file_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, message_id, content, reason, media_type, media_file_id))
-        await db.commit()
+    await write_queue.enqueue('''
+        INSERT INTO filtered_messages
+        (user_id, message_id, content, reason, media_type, media_file_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (user_id, message_id, content, reason, media_type, media_file_id))
 
 async def get_filtered_messages(limit: int = 20, offset: int = 0):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT fm.*, u.first_name, u.username
             FROM filtered_messages fm
@@ -83,24 +182,29 @@ async def get_filtered_messages(limit: int = 20, offset: int = 0):
             return [dict(zip(cols, row)) for row in rows]
 
 async def get_filtered_messages_count() -> int:
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('SELECT COUNT(*) FROM filtered_messages') as cursor:
             row = await cursor.fetchone()
             return row[0] if row else 0
 
 async def is_blacklisted(user_id: int):
-    async with db_manager.get_connection() as db:
+    cached = user_cache.get(user_id, "blacklist")
+    if cached is not MISSING:
+        return cached
+
+    token = user_cache.begin()
+    async with db_manager.get_read_connection() as db:
         async with db.execute(
             'SELECT permanent FROM blacklist WHERE user_id = ?',
             (user_id,)
         ) as cursor:
             row = await cursor.fetchone()
-            if row:
-                return True, bool(row[0])
-            return False, False
+            result = (True, bool(row[0])) if row else (False, False)
+    user_cache.store(user_id, "blacklist", result, token)
+    return result
 
 async def add_to_blacklist(user_id: int, reason: str, blocked_by: int, permanent: bool = False):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_write_connection() as db:
         await db.execute(
             'UPDATE users SET is_blacklisted = 1, blacklist_strikes = blacklist_strikes + 1 WHERE user_id = ?',
             (user_id,)
@@ -110,18 +214,20 @@ async def add_to_blacklist(user_id: int, reason: str, blocked_by: int, permanent
             VALUES (?, ?, ?, ?)
         ''', (user_id, reason, blocked_by, 1 if permanent else 0))
         await db.commit()
+    user_cache.invalidate(user_id)
 
 async def remove_from_blacklist(user_id: int):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_write_connection() as db:
         await db.execute(
             'UPDATE users SET is_blacklisted = 0 WHERE user_id = ?',
             (user_id,)
         )
         await db.execute('DELETE FROM blacklist WHERE user_id = ?', (user_id,))
         await db.commit()
+    user_cache.invalidate(user_id)
 
 async def get_blacklist():
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT b.user_id, u.first_name, u.username, b.reason, b.blocked_at
             FROM blacklist b
@@ -135,7 +241,7 @@ async def get_blacklist():
             return [dict(zip(cols, row)) for row in rows]
 
 async def get_blacklist_paginated(limit: int = 5, offset: int = 0):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT b.user_id, u.first_name, u.username, b.reason, b.blocked_at
             FROM blacklist b
@@ -150,13 +256,13 @@ async def get_blacklist_paginated(limit: int = 5, offset: int = 0):
             return [dict(zip(cols, row)) for row in rows]
 
 async def get_blacklist_count() -> int:
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('SELECT COUNT(*) FROM blacklist') as cursor:
             row = await cursor.fetchone()
             return row[0] if row else 0
 
 async def set_user_blacklist_strikes(user_id: int, strikes: int):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_write_connection() as db:
         await db.execute(
             'INSERT OR IGNORE INTO users (user_id, first_name) VALUES (?, ?)',
             (user_id, f"User_{user_id}")
@@ -166,30 +272,37 @@ async def set_user_blacklist_strikes(user_id: int, strikes: int):
             (strikes, user_id)
         )
         await db.commit()
+    user_cache.invalidate(user_id)
 
 async def is_admin(user_id: int) -> bool:
     return user_id in config.ADMIN_IDS
 
+async def get_database_profile() -> dict:
+    return await db_manager.get_pragma_report()
+
+def get_user_cache_stats() -> dict:
+    return user_cache.stats()
+
 async def get_total_users_count() -> int:
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('SELECT COUNT(*) FROM users') as cursor:
             row = await cursor.fetchone()
             return row[0] if row else 0
 
 async def get_blocked_users_count() -> int:
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('SELECT COUNT(*) FROM blacklist') as cursor:
             row = await cursor.fetchone()
             return row[0] if row else 0
 
 async def get_user_spam_count(user_id: int) -> int:
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('SELECT COUNT(*) FROM filtered_messages WHERE user_id = ?', (user_id,)) as cursor:
             row = await cursor.fetchone()
             return row[0] if row else 0
 
 async def get_all_users_paginated(limit: int = 5, offset: int = 0):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT 
                 u.user_id,
@@ -213,7 +326,7 @@ async def get_all_users_paginated(limit: int = 5, offset: int = 0):
             return [dict(zip(cols, row)) for row in rows]
 
 async def get_blacklist_user_details(user_id: int):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT 
                 b.user_id,
@@ -244,15 +357,17 @@ async def get_blacklist_user_details(user_id: int):
             return None
 
 async def add_knowledge_entry(title: str, content: str):
-    async with db_manager.get_connection() as db:
-        await db.execute('''
+    async with db_manager.get_write_connection() as db:
+        cursor = await db.execute('''
             INSERT INTO knowledge_base (title, content, updated_at)
             VALUES (?, ?, CURRENT_TIMESTAMP)
         ''', (title, content))
         await db.commit()
+    if knowledge_index.warmed:
+        knowledge_index.add(cursor.lastrowid, title, content)
 
 async def get_all_knowledge_entries():
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT id, title, content, created_at, updated_at
             FROM knowledge_base
@@ -265,7 +380,7 @@ async def get_all_knowledge_entries():
             return [dict(zip(cols, row)) for row in rows]
 
 async def get_knowledge_entry(knowledge_id: int):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT id, title, content, created_at, updated_at
             FROM knowledge_base
@@ -278,21 +393,23 @@ async def get_knowledge_entry(knowledge_id: int):
             return None
 
 async def update_knowledge_entry(knowledge_id: int, title: str, content: str):
-    async with db_manager.get_connection() as db:
-        await db.execute('''
+    async with db_manager.get_write_connection() as db:
+        cursor = await db.execute('''
             UPDATE knowledge_base
             SET title = ?, content = ?, updated_at = CURRENT_TIMESTAMP
             WHERE id = ?
         ''', (title, content, knowledge_id))
         await db.commit()
+    if cursor.rowcount > 0 and knowledge_index.warmed:
+        knowledge_index.add(knowledge_id, title, content)
 
 async def delete_knowledge_entry(knowledge_id: int):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_write_connection() as db:
         await db.execute('DELETE FROM knowledge_base WHERE id = ?', (knowledge_id,))
         await db.commit()
+    knowledge_index.remove(knowledge_id)
 
-async def get_all_knowledge_content() -> str:
-    entries = await get_all_knowledge_entries()
+def _format_knowledge_content(entries) -> str:
     if not entries:
         return ""
     
@@ -303,71 +420,98 @@ async def get_all_knowledge_content() -> str:
     
     return knowledge_text
 
-async def get_autoreply_enabled() -> bool:
-    async with db_manager.get_connection() as db:
-        async with db.execute(
-            'SELECT value FROM settings WHERE key = ?',
-            ('autoreply_enabled',)
-        ) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                return row[0] == '1'
-            return False
+_knowledge_snapshot = {"version": None, "content": ""}
 
-async def set_autoreply_enabled(enabled: bool):
-    async with db_manager.get_connection() as db:
-        await db.execute(
-            'UPDATE settings SET value = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ?',
-            ('1' if enabled else '0', 'autoreply_enabled')
-        )
+async def get_all_knowledge_content() -> str:
+    if not knowledge_index.warmed:
+        await warm_knowledge_index()
+    if _knowledge_snapshot["version"] != knowledge_index.version:
+        _knowledge_snapshot["content"] = _format_knowledge_content(knowledge_index.entries())
+        _knowledge_snapshot["version"] = knowledge_index.version
+    return _knowledge_snapshot["content"]
+
+def get_knowledge_version() -> int:
+    return knowledge_index.version
+
+async def warm_knowledge_index():
+    knowledge_index.load(await get_all_knowledge_entries())
+    return len(knowledge_index)
+
+async def get_relevant_knowledge_content(question: str, top_k: int = None) -> str:
+    if not knowledge_index.warmed:
+        await warm_knowledge_index()
+    top_k = top_k or config.KB_RETRIEVAL_TOP_K
+    if len(knowledge_index) <= top_k:
+        return await get_all_knowledge_content()
+    return _format_knowledge_content([entry for entry, _ in knowledge_index.search(question, top_k)])
+
+async def get_all_settings() -> dict:
+    async with db_manager.get_read_connection() as db:
+        async with db.execute('SELECT key, value FROM settings') as cursor:
+            return {key: value for key, value in await cursor.fetchall()}
+
+async def set_setting(key: str, value: str):
+    async with db_manager.get_write_connection() as db:
+        await db.execute('''
+            INSERT INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+        ''', (key, value))
         await db.commit()
 
-async def is_exempted(user_id: int) -> bool:
-    async with db_manager.get_connection() as db:
-        async with db.execute('''
-            SELECT is_permanent, expires_at 
-            FROM exemptions 
-            WHERE user_id = ?
-        ''', (user_id,)) as cursor:
-            row = await cursor.fetchone()
-            if not row:
-                return False
-            
-            is_permanent = bool(row[0])
-            expires_at = row[1]
-            
-            if is_permanent:
-                return True
-            
-            if expires_at:
-                try:
-                    expires_datetime = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
-                    if expires_datetime.tzinfo is None:
-                        expires_datetime = expires_datetime.replace(tzinfo=timezone.utc)
-                    now = datetime.now(timezone.utc)
-                    return expires_datetime > now
-                except Exception as e:
-                    print(f"解析豁免过期时间失败: {e}")
-                    return False
-            
+def _is_exemption_valid(is_permanent, expires_at) -> bool:
+    if is_permanent:
+        return True
+    
+    if expires_at:
+        try:
+            expires_datetime = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+            if expires_datetime.tzinfo is None:
+                expires_datetime = expires_datetime.replace(tzinfo=timezone.utc)
+            now = datetime.now(timezone.utc)
+            return expires_datetime > now
+        except Exception as e:
+            print(f"解析豁免过期时间失败: {e}")
             return False
+    
+    return False
+
+async def is_exempted(user_id: int) -> bool:
+    cached = user_cache.get(user_id, "exemption")
+    if cached is MISSING:
+        token = user_cache.begin()
+        async with db_manager.get_read_connection() as db:
+            async with db.execute('''
+                SELECT is_permanent, expires_at 
+                FROM exemptions 
+                WHERE user_id = ?
+            ''', (user_id,)) as cursor:
+                row = await cursor.fetchone()
+                cached = (bool(row[0]), row[1]) if row else None
+        user_cache.store(user_id, "exemption", cached, token)
+    
+    if not cached:
+        return False
+    
+    return _is_exemption_valid(*cached)
 
 async def add_exemption(user_id: int, is_permanent: bool, exempted_by: int, reason: str = None, expires_at: str = None):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_write_connection() as db:
         await db.execute('''
             INSERT OR REPLACE INTO exemptions 
             (user_id, is_permanent, expires_at, exempted_by, reason, created_at)
             VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
         ''', (user_id, 1 if is_permanent else 0, expires_at, exempted_by, reason))
         await db.commit()
+    user_cache.invalidate(user_id)
 
 async def remove_exemption(user_id: int):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_write_connection() as db:
         await db.execute('DELETE FROM exemptions WHERE user_id = ?', (user_id,))
         await db.commit()
+    user_cache.invalidate(user_id)
 
 async def get_exemption(user_id: int):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT user_id, is_permanent, expires_at, exempted_by, reason, created_at
             FROM exemptions
@@ -380,7 +524,7 @@ async def get_exemption(user_id: int):
             return None
 
 async def get_all_exemptions():
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT e.user_id, u.first_name, u.username, e.is_permanent, e.expires_at, 
                    e.exempted_by, e.reason, e.created_at
@@ -395,7 +539,7 @@ async def get_all_exemptions():
             return [dict(zip(cols, row)) for row in rows]
 
 async def get_exemptions_paginated(limit: int = 5, offset: int = 0):
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('''
             SELECT e.user_id, u.first_name, u.username, e.is_permanent, e.expires_at, 
                    e.exempted_by, e.reason, e.created_at
@@ -411,7 +555,79 @@ async def get_exemptions_paginated(limit: int = 5, offset: int = 0):
             return [dict(zip(cols, row)) for row in rows]
 
 async def get_exemptions_count() -> int:
-    async with db_manager.get_connection() as db:
+    async with db_manager.get_read_connection() as db:
         async with db.execute('SELECT COUNT(*) FROM exemptions') as cursor:
             row = await cursor.fetchone()
-            return row[0] if row else 0
\ No newline at end of file
+            return row[0] if row else 0
+
+async def save_verdict(content_hash: str, is_spam: bool, reason: str):
+    await write_queue.enqueue('''
+        INSERT OR REPLACE INTO verdict_cache (content_hash, is_spam, reason, created_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (content_hash, 1 if is_spam else 0, reason))
+
+async def load_verdicts(ttl: int, limit: int):
+    if ttl > 0:
+        async with db_manager.get_write_connection() as db:
+            await db.execute(
+                "DELETE FROM verdict_cache WHERE created_at < datetime('now', ?)",
+                (f'-{int(ttl)} seconds',)
+            )
+            await db.commit()
+    async with db_manager.get_read_connection() as db:
+        async with db.execute('''
+            SELECT content_hash, is_spam, reason,
+                   CAST(strftime('%s', 'now') - strftime('%s', created_at) AS INTEGER) AS age
+            FROM verdict_cache
+            ORDER BY created_at DESC
+            LIMIT ?
+        ''', (limit,)) as cursor:
+            return await cursor.fetchall()
+
+async def save_image_hash(phash: int, text_hash: str, is_spam: bool, reason: str):
+    await write_queue.enqueue('''
+        INSERT OR REPLACE INTO image_hashes (phash, text_hash, is_spam, reason, created_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (phash, text_hash, 1 if is_spam else 0, reason))
+
+async def load_image_hashes(limit: int):
+    async with db_manager.get_write_connection() as db:
+        await db.execute('''
+            DELETE FROM image_hashes
+            WHERE id <= (SELECT id FROM image_hashes ORDER BY id DESC LIMIT 1 OFFSET ?)
+        ''', (limit,))
+        await db.commit()
+    async with db_manager.get_read_connection() as db:
+        async with db.execute('''
+            SELECT phash, text_hash, is_spam, reason
+            FROM image_hashes
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (limit,)) as cursor:
+            return await cursor.fetchall()
+
+async def get_prefilter_rules():
+    async with db_manager.get_read_connection() as db:
+        async with db.execute(
+            'SELECT id, rule_type, pattern, created_by, created_at FROM prefilter_rules ORDER BY id'
+        ) as cursor:
+            rows = await cursor.fetchall()
+            return [
+                {"id": row[0], "rule_type": row[1], "pattern": row[2], "created_by": row[3], "created_at": row[4]}
+                for row in rows
+            ]
+
+async def add_prefilter_rule(rule_type: str, pattern: str, created_by: int) -> bool:
+    async with db_manager.get_write_connection() as db:
+        cursor = await db.execute(
+            'INSERT OR IGNORE INTO prefilter_rules (rule_type, pattern, created_by) VALUES (?, ?, ?)',
+            (rule_type, pattern, created_by)
+        )
+        await db.commit()
+        return cursor.rowcount > 0
+
+async def remove_prefilter_rule(rule_id: int) -> bool:
+    async with db_manager.get_write_connection() as db:
+        cursor = await db.execute('DELETE FROM prefilter_rules WHERE id = ?', (rule_id,))
+        await db.commit()
+        return cursor.rowcount > 0
@@ -0,0 +1,64 @@
+from config import config
+from utils.lru_cache import TTLCache, MISSING
+
+USER_STATE_FIELDS = ("user", "blacklist", "exemption")
+
+class UserStateCache:
+    def __init__(self, max_size: int, ttl: float):
+        self._entries = TTLCache(max_size * len(USER_STATE_FIELDS), ttl)
+        self._version = 0
+
+    def begin(self) -> int:
+        return self._version
+
+    def get(self, user_id: int, field: str):
+        return self._entries.get((user_id, field), MISSING)
+
+    def store(self, user_id: int, field: str, value, token: int):
+        if token == self._version:
+            self._entries.set((user_id, field), value)
+
+    def invalidate(self, user_id: int):
+        self._version += 1
+        for field in USER_STATE_FIELDS:
+            self._entries.pop((user_id, field))
+
+    def clear(self):
+        self._version += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+class ThreadIndex:
+    def __init__(self):
+        self.warmed = False
+        self._thread_to_user = {}
+        self._user_to_thread = {}
+
+    def load(self, pairs):
+        self._thread_to_user.clear()
+        self._user_to_thread.clear()
+        for user_id, thread_id in pairs:
+            self.set(user_id, thread_id)
+        self.warmed = True
+
+    def set(self, user_id: int, thread_id):
+        old_thread_id = self._user_to_thread.pop(user_id, None)
+        if old_thread_id is not None and self._thread_to_user.get(old_thread_id) == user_id:
+            del self._thread_to_user[old_thread_id]
+        if thread_id is not None:
+            self._user_to_thread[user_id] = thread_id
+            self._thread_to_user[thread_id] = user_id
+
+    def user_for(self, thread_id: int):
+        return self._thread_to_user.get(thread_id)
+
+    def thread_for(self, user_id: int):
+        return self._user_to_thread.get(user_id)
+
+    def __len__(self):
+        return len(self._thread_to_user)
+
+user_cache = UserStateCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+thread_index = ThreadIndex()
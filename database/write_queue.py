@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from config import config
+from .db_manager import db_manager
+
+class WriteBehindQueue:
+    def __init__(self, batch_size: int, flush_interval_ms: int, max_backlog: int):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0, flush_interval_ms) / 1000
+        self.max_backlog = max(1, max_backlog)
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches_written = 0
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_backlog)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def backlog(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def enqueue(self, sql: str, params: tuple):
+        self._ensure_worker()
+        await self._queue.put((sql, params))
+
+    async def _collect_batch(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch):
+        grouped = {}
+        for sql, params in batch:
+            grouped.setdefault(sql, []).append(params)
+        try:
+            async with db_manager.get_write_connection() as db:
+                for sql, rows in grouped.items():
+                    await db.executemany(sql, rows)
+                await db.commit()
+            self.rows_written += len(batch)
+            self.batches_written += 1
+        except Exception as e:
+            self.rows_failed += len(batch)
+            logging.error(f"批量写入 {len(batch)} 条记录失败: {e}")
+
+    async def flush(self):
+        if self._queue is not None and self._worker is not None and not self._worker.done():
+            await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._queue = None
+        if self.rows_written or self.rows_failed:
+            logging.info(f"写入队列已关闭：累计写入 {self.rows_written} 条，失败 {self.rows_failed} 条。")
+
+write_queue = WriteBehindQueue(
+    config.DB_WRITE_BATCH_SIZE,
+    config.DB_WRITE_FLUSH_MS,
+    config.DB_WRITE_QUEUE_SIZE
+)
@@ -1,5 +1,5 @@
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
-from .command_handler import start, help_command, block, unblock, blacklist, stats, getid, autoreply, panel, exempt
+from .command_handler import start, help_command, block, unblock, blacklist, stats, getid, autoreply, panel, exempt, prefilter, setting
 from .user_handler import handle_message
 from .callback_handler import handle_callback
 from .admin_handler import handle_admin_reply, view_filtered
@@ -33,6 +33,8 @@ def register_handlers(app: Application):
         app.add_handler(CommandHandler("view_filtered", view_filtered))
         app.add_handler(CommandHandler("autoreply", autoreply))
         app.add_handler(CommandHandler("exempt", exempt))
+        app.add_handler(CommandHandler("prefilter", prefilter))
+        app.add_handler(CommandHandler("setting", setting))
         
         app.add_handler(MessageHandler(
             filters.Chat(chat_id=config.FORUM_GROUP_ID) & filters.REPLY & ~filters.COMMAND,
@@ -1,10 +1,33 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database import models as db
-from utils.message_sender import send_message_by_type
+from utils.message_sender import send_message_by_type, get_media_info
+
+async def _get_user_reply_target(message):
+    reply_to = message.reply_to_message
+    if not reply_to or reply_to.message_id == message.message_thread_id:
+        return None
+    return await db.get_user_chat_message_id(message.message_thread_id, reply_to.message_id)
 
 async def _send_reply_to_user(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int):
-    await send_message_by_type(context.bot, update.message, user_id, None, True)
+    message = update.message
+    reply_to_message_id = await _get_user_reply_target(message)
+    sent_msg = await send_message_by_type(
+        context.bot, message, user_id, None, True,
+        reply_to_message_id=reply_to_message_id
+    )
+    media_type, media_file_id = get_media_info(message)
+    await db.save_message(
+        user_id=user_id,
+        message_id=message.message_id,
+        content=message.text or message.caption,
+        direction="outgoing",
+        media_type=media_type,
+        media_file_id=media_file_id,
+        thread_id=message.message_thread_id,
+        forwarded_message_id=sent_msg.message_id if sent_msg else None,
+        reply_to_message_id=reply_to_message_id
+    )
 
 async def handle_admin_reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.is_topic_message:
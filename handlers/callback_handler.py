@@ -5,6 +5,8 @@ from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 from services.verification import verify_answer, create_verification
 from services.gemini_service import gemini_service
+from services.prefilter import spam_prefilter, RULE_TYPES as PREFILTER_RULE_TYPES
+from services.settings import bot_settings, SETTING_NAMES
 from database import models as db
 from utils.media_converter import sticker_to_image
 from services.thread_manager import get_or_create_thread
@@ -15,6 +17,8 @@ from rss import enable_feature as rss_enable_feature, disable_feature as rss_dis
 
 RSS_PANEL_CACHE_KEY = "rss_panel_cache"
 RSS_FEEDS_PER_PAGE = 4
+PREFILTER_RULES_PER_PAGE = 8
+SETTINGS_TOGGLE_KEYS = ('verification_enabled', 'ai_filter_enabled', 'autoreply_enabled')
 RSS_DOC_URL = "https://github.com/Hamster-Prime/Telegram_Anti-harassment_two-way_chatbot#-rss-%E8%AE%A2%E9%98%85%E5%8A%9F%E8%83%BD"
 
 
@@ -208,6 +212,121 @@ def _build_rss_feed_detail(application, chat_id: str, feed_url: str):
 
     return "\n".join(lines), InlineKeyboardMarkup(keyboard_rows)
 
+
+def _build_settings_panel_view():
+    lines = ["系统设置", ""]
+    for key in SETTINGS_TOGGLE_KEYS:
+        lines.append(f"{SETTING_NAMES[key]}: {'已启用' if bot_settings.get(key) else '已关闭'}")
+    lines.extend([
+        f"{SETTING_NAMES['max_message_length']}: {bot_settings.max_message_length()}",
+        f"{SETTING_NAMES['queue_max_size']}: {bot_settings.queue_max_size()}",
+    ])
+    if not config.VERIFICATION_ENABLED or not config.ENABLE_AI_FILTER:
+        lines.extend(["", "注意：环境变量中已关闭的功能（VERIFICATION_ENABLED / ENABLE_AI_FILTER）无法在此开启。"])
+    lines.extend(["", "数值类设置请使用命令修改：", "/setting <名称> <值>"])
+
+    keyboard = [
+        [
+            InlineKeyboardButton(
+                f"{'关闭' if bot_settings.get(key) else '开启'}{SETTING_NAMES[key]}",
+                callback_data=f"panel_settings_toggle_{key}",
+            )
+        ]
+        for key in SETTINGS_TOGGLE_KEYS
+    ]
+    keyboard.append([InlineKeyboardButton("返回主面板", callback_data="panel_back")])
+
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+
+def _build_prefilter_panel_view():
+    stats = spam_prefilter.stats()
+    lines = [
+        "本地预过滤管理",
+        "",
+        f"当前状态: {'已启用' if stats['enabled'] else '已关闭'}",
+        f"简短文本直接放行: {'已启用' if stats['fast_accept'] else '已关闭'}",
+        f"规则数量: {stats['rules']}",
+        "",
+        f"已检查消息: {stats['checked']}",
+        f"本地拦截: {stats['local_spam']}，本地放行: {stats['local_ham']}，交由 AI: {stats['escalated']}",
+        f"本地处理占比: {stats['resolved_rate']:.1%}",
+        "",
+        "常用命令：",
+        "/prefilter add <domain|keyword|regex> <内容>",
+        "/prefilter remove <ID>",
+        "/prefilter list",
+    ]
+
+    keyboard = [
+        [
+            InlineKeyboardButton(
+                "关闭本地预过滤" if stats['enabled'] else "开启本地预过滤",
+                callback_data="panel_prefilter_toggle",
+            )
+        ],
+        [
+            InlineKeyboardButton(
+                "关闭简短文本放行" if stats['fast_accept'] else "开启简短文本放行",
+                callback_data="panel_prefilter_fast_toggle",
+            )
+        ],
+        [InlineKeyboardButton("查看过滤规则", callback_data="panel_prefilter_rules_page_1")],
+        [InlineKeyboardButton("返回主面板", callback_data="panel_back")],
+    ]
+
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+
+def _build_prefilter_rules_view(page: int):
+    rules = spam_prefilter.rules
+    total = len(rules)
+
+    if total == 0:
+        keyboard = [
+            [InlineKeyboardButton("返回预过滤管理", callback_data="panel_prefilter")],
+            [InlineKeyboardButton("返回主面板", callback_data="panel_back")],
+        ]
+        return "当前没有任何本地过滤规则。", InlineKeyboardMarkup(keyboard)
+
+    per_page = PREFILTER_RULES_PER_PAGE
+    total_pages = (total + per_page - 1) // per_page
+    page = max(1, min(page, total_pages))
+    start = (page - 1) * per_page
+    subset = rules[start : start + per_page]
+
+    lines = [f"本地过滤规则 (第 {page}/{total_pages} 页)", ""]
+    keyboard_rows = []
+
+    for rule in subset:
+        rule_type = PREFILTER_RULE_TYPES.get(rule['rule_type'], rule['rule_type'])
+        lines.append(f"ID {rule['id']} [{rule_type}] {rule['pattern']}")
+        keyboard_rows.append(
+            [
+                InlineKeyboardButton(
+                    f"删除规则 #{rule['id']}",
+                    callback_data=f"panel_prefilter_del_{rule['id']}_{page}",
+                )
+            ]
+        )
+
+    nav_buttons = []
+    if page > 1:
+        nav_buttons.append(
+            InlineKeyboardButton("上一页", callback_data=f"panel_prefilter_rules_page_{page-1}")
+        )
+    if page < total_pages:
+        nav_buttons.append(
+            InlineKeyboardButton("下一页", callback_data=f"panel_prefilter_rules_page_{page+1}")
+        )
+    if nav_buttons:
+        keyboard_rows.append(nav_buttons)
+
+    keyboard_rows.append([InlineKeyboardButton("返回预过滤管理", callback_data="panel_prefilter")])
+    keyboard_rows.append([InlineKeyboardButton("返回主面板", callback_data="panel_back")])
+
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard_rows)
+
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -263,13 +382,16 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 if message.video or message.animation:
                     pass
                 else:
-                    analyzing_message = await context.bot.send_message(
-                        chat_id=message.chat_id,
-                        text="正在通过AI分析内容是否包含垃圾信息...",
-                        reply_to_message_id=message.message_id
-                    )
-                    analysis_result = await gemini_service.analyze_message(message, image_bytes)
-                    if analysis_result.get("is_spam"):
+                    analyzing_message = None
+                    analysis_result = spam_prefilter.check(message, user_id, image_bytes)
+                    if analysis_result is None and gemini_service.is_filter_enabled():
+                        analyzing_message = await context.bot.send_message(
+                            chat_id=message.chat_id,
+                            text="正在通过AI分析内容是否包含垃圾信息...",
+                            reply_to_message_id=message.message_id
+                        )
+                        analysis_result = await gemini_service.analyze_message(message, image_bytes)
+                    if analysis_result and analysis_result.get("is_spam"):
                         should_forward = False
                         media_type = None
                         media_file_id = None
@@ -289,8 +411,12 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                             media_file_id=media_file_id,
                         )
                         reason = analysis_result.get("reason", "未提供原因")
-                        await analyzing_message.edit_text(f"您的消息已被系统拦截，因此未被转发\n\n原因：{reason}")
-                    else:
+                        blocked_text = f"您的消息已被系统拦截，因此未被转发\n\n原因：{reason}"
+                        if analyzing_message:
+                            await analyzing_message.edit_text(blocked_text)
+                        else:
+                            await message.reply_text(blocked_text)
+                    elif analyzing_message:
                         await analyzing_message.delete()
 
                 if should_forward:
@@ -333,7 +459,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         total_users = await db.get_total_users_count()
         blocked_users = await db.get_blocked_users_count()
         exempted_users = await db.get_exemptions_count()
-        is_enabled = await db.get_autoreply_enabled()
+        is_enabled = bot_settings.autoreply_enabled()
         
         message = (
             f"管理面板\n\n"
@@ -349,7 +475,8 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             [InlineKeyboardButton("黑名单管理", callback_data="panel_blacklist_page_1"), InlineKeyboardButton("所有用户信息", callback_data="panel_stats")],
             [InlineKeyboardButton("被过滤消息", callback_data="panel_filtered_page_1"), InlineKeyboardButton("自动回复管理", callback_data="panel_autoreply")],
             [InlineKeyboardButton("豁免名单管理", callback_data="panel_exemptions_page_1"), InlineKeyboardButton("网络测试管理", callback_data="panel_network_test")],
-            [InlineKeyboardButton("RSS 功能管理", callback_data="panel_rss")],
+            [InlineKeyboardButton("RSS 功能管理", callback_data="panel_rss"), InlineKeyboardButton("本地预过滤", callback_data="panel_prefilter")],
+            [InlineKeyboardButton("系统设置", callback_data="panel_settings")],
         ]
         
         await query.edit_message_text(
@@ -537,7 +664,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
             return
         
-        is_enabled = await db.get_autoreply_enabled()
+        is_enabled = bot_settings.autoreply_enabled()
         status_text = "已启用" if is_enabled else "已禁用"
         
         message = (
@@ -572,6 +699,90 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message, keyboard = _build_rss_panel_view()
         await query.edit_message_text(message, reply_markup=keyboard)
     
+    elif data == "panel_settings":
+        if not await db.is_admin(user_id):
+            await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
+            return
+
+        message, keyboard = _build_settings_panel_view()
+        await query.edit_message_text(message, reply_markup=keyboard)
+    
+    elif data.startswith("panel_settings_toggle_"):
+        if not await db.is_admin(user_id):
+            await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
+            return
+
+        key = data[len("panel_settings_toggle_"):]
+        if key not in SETTINGS_TOGGLE_KEYS:
+            await query.answer("未知的设置项。", show_alert=True)
+            return
+
+        enabled = await bot_settings.toggle(key)
+        await query.answer(f"{SETTING_NAMES[key]}已{'开启' if enabled else '关闭'}", show_alert=True)
+        message, keyboard = _build_settings_panel_view()
+        await query.edit_message_text(message, reply_markup=keyboard)
+    
+    elif data == "panel_prefilter":
+        if not await db.is_admin(user_id):
+            await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
+            return
+
+        message, keyboard = _build_prefilter_panel_view()
+        await query.edit_message_text(message, reply_markup=keyboard)
+    
+    elif data == "panel_prefilter_toggle":
+        if not await db.is_admin(user_id):
+            await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
+            return
+
+        await spam_prefilter.set_enabled(not spam_prefilter.enabled)
+        await query.answer(f"本地预过滤已{'开启' if spam_prefilter.enabled else '关闭'}", show_alert=True)
+        message, keyboard = _build_prefilter_panel_view()
+        await query.edit_message_text(message, reply_markup=keyboard)
+    
+    elif data == "panel_prefilter_fast_toggle":
+        if not await db.is_admin(user_id):
+            await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
+            return
+
+        await spam_prefilter.set_fast_accept(not spam_prefilter.fast_accept)
+        await query.answer(f"简短文本放行已{'开启' if spam_prefilter.fast_accept else '关闭'}", show_alert=True)
+        message, keyboard = _build_prefilter_panel_view()
+        await query.edit_message_text(message, reply_markup=keyboard)
+    
+    elif data.startswith("panel_prefilter_rules_page_"):
+        if not await db.is_admin(user_id):
+            await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
+            return
+
+        try:
+            page = int(data.split("_")[-1])
+        except (ValueError, IndexError):
+            await query.answer("无效的页码。", show_alert=True)
+            return
+
+        message, keyboard = _build_prefilter_rules_view(page)
+        await query.edit_message_text(message, reply_markup=keyboard)
+    
+    elif data.startswith("panel_prefilter_del_"):
+        if not await db.is_admin(user_id):
+            await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
+            return
+
+        try:
+            rule_id, page = map(int, data.split("_")[3:5])
+        except ValueError:
+            await query.answer("无效的规则ID。", show_alert=True)
+            return
+
+        if await spam_prefilter.remove_rule(rule_id):
+            await query.answer(f"已删除规则 #{rule_id}", show_alert=True)
+        else:
+            await query.answer("规则不存在。", show_alert=True)
+
+        message, keyboard = _build_prefilter_rules_view(page)
+        await query.edit_message_text(message, reply_markup=keyboard)
+    
     elif data == "panel_rss_toggle":
         if not await db.is_admin(user_id):
             await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
@@ -677,12 +888,12 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
             return
         
-        is_enabled = await db.get_autoreply_enabled()
-        await db.set_autoreply_enabled(not is_enabled)
+        is_enabled = bot_settings.autoreply_enabled()
+        await bot_settings.set('autoreply_enabled', not is_enabled)
         new_status = "已启用" if not is_enabled else "已禁用"
         await query.answer(f"自动回复已{new_status}", show_alert=True)
         
-        is_enabled = await db.get_autoreply_enabled()
+        is_enabled = bot_settings.autoreply_enabled()
         status_text = "已启用" if is_enabled else "已禁用"
         
         message = (
@@ -1475,22 +1686,13 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.edit_message_text(text=message, parse_mode='Markdown')
     
     elif data == "stats_back_to_menu":
-        from .command_handler import stats
+        from .command_handler import build_stats_message
         
         if not await db.is_admin(user_id):
             await query.answer("抱歉，您没有权限执行此操作。", show_alert=True)
             return
         
-        total_users = await db.get_total_users_count()
-        blocked_users = await db.get_blocked_users_count()
-        
-        stats_message = (
-            f"机器人统计数据\n"
-            f"---------------------\n"
-            f"总用户数: {total_users}\n"
-            f"黑名单用户数: {blocked_users}\n\n"
-            f"请选择要查看的列表："
-        )
+        stats_message = await build_stats_message()
         
         keyboard = [
             [InlineKeyboardButton("所有用户列表", callback_data="stats_list_all_users_page_1")],
@@ -1509,12 +1711,12 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         if data == "autoreply_toggle":
-            is_enabled = await db.get_autoreply_enabled()
-            await db.set_autoreply_enabled(not is_enabled)
+            is_enabled = bot_settings.autoreply_enabled()
+            await bot_settings.set('autoreply_enabled', not is_enabled)
             new_status = "已启用" if not is_enabled else "已禁用"
             await query.answer(f"自动回复已{new_status}", show_alert=True)
             
-            is_enabled = await db.get_autoreply_enabled()
+            is_enabled = bot_settings.autoreply_enabled()
             status_text = "已启用" if is_enabled else "已禁用"
             
             message = (
@@ -1724,7 +1926,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
         
         elif data == "autoreply_back":
-            is_enabled = await db.get_autoreply_enabled()
+            is_enabled = bot_settings.autoreply_enabled()
             status_text = "已启用" if is_enabled else "已禁用"
             
             message = (
@@ -4,6 +4,15 @@ from telegram.ext import ContextTypes
 from database import models as db
 from services.blacklist import block_user, unblock_user, get_blacklist_keyboard
 from utils.decorators import admin_only
+from services.ingress_queue import ingress_queue
+from services.verdict_cache import verdict_cache
+from services.image_hash import image_index
+from services.prefilter import spam_prefilter
+from services.challenge_pool import challenge_pool
+from services.resilience import gemini_caller, STATE_NAMES
+from services.gemini_service import gemini_service
+from services.autoreply_cache import autoreply_cache
+from services.settings import bot_settings, SETTING_DEFAULTS, SETTING_NAMES
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
@@ -39,6 +48,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "- `/stats` - 查看统计信息\n"
         "- `/view_filtered` - 查看被拦截信息及发送者\n"
         "- `/exempt` - 豁免用户内容审查（临时或永久）\n"
+        "- `/prefilter` - 管理本地垃圾消息预过滤规则\n"
+        "- `/setting` - 查看或修改运行时设置\n"
     )
     
     await update.message.reply_text(help_text, parse_mode='Markdown')
@@ -94,18 +105,59 @@ async def unblock(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except (ValueError, IndexError):
         await update.message.reply_text("无效的用户ID。")
 
-@admin_only
-async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def build_stats_message() -> str:
     total_users = await db.get_total_users_count()
     blocked_users = await db.get_blocked_users_count()
+    profile = await db.get_database_profile()
+    user_cache_stats = db.get_user_cache_stats()
+    queue_stats = ingress_queue.stats()
+    verdict_stats = verdict_cache.stats()
+    image_stats = image_index.stats()
+    prefilter_stats = spam_prefilter.stats()
+    pool_stats = challenge_pool.stats()
+    gemini_stats = gemini_caller.stats()
+    breaker = gemini_stats['breaker']
+    batch_stats = gemini_service.batcher.stats()
+    autoreply_stats = autoreply_cache.stats()
+    latency_lines = "".join(
+        f"{operation}: P50 {item['p50_ms']:.0f} / P95 {item['p95_ms']:.0f} / P99 {item['p99_ms']:.0f} 毫秒，"
+        f"调用 {item['calls']}，失败 {item['failures']}（超时 {item['timeouts']}）\n"
+        for operation, item in gemini_stats['operations'].items()
+    )
     
-    stats_message = (
+    return (
         f"机器人统计数据\n"
         f"---------------------\n"
         f"总用户数: {total_users}\n"
         f"黑名单用户数: {blocked_users}\n\n"
+        f"数据库参数:\n"
+        f"日志模式: {profile.get('journal_mode')}\n"
+        f"同步级别: {profile.get('synchronous')}\n"
+        f"页缓存: {profile.get('cache_size')}\n"
+        f"内存映射: {profile.get('mmap_size')} 字节\n"
+        f"临时存储: {profile.get('temp_store')}\n"
+        f"忙等待: {profile.get('busy_timeout')} 毫秒\n"
+        f"用户缓存: {user_cache_stats['size']} 条，命中率 {user_cache_stats['hit_rate']:.1%}\n\n"
+        f"消息接收队列:\n"
+        f"当前深度: {queue_stats['depth']}/{queue_stats['max_size']}（峰值 {queue_stats['peak_depth']}）\n"
+        f"排队等待: 平均 {queue_stats['avg_wait_ms']:.0f} 毫秒，P95 {queue_stats['p95_wait_ms']:.0f} 毫秒\n"
+        f"已拒收: {queue_stats['rejected']}，已降级: {queue_stats['shed']}\n\n"
+        f"AI 审查缓存: {verdict_stats['size']} 条，命中 {verdict_stats['hits']}，未命中 {verdict_stats['misses']}\n"
+        f"相似图片索引: {image_stats['size']} 个哈希，命中 {image_stats['hits']}，未命中 {image_stats['misses']}\n"
+        f"本地预过滤: 拦截 {prefilter_stats['local_spam']}，放行 {prefilter_stats['local_ham']}，交由 AI {prefilter_stats['escalated']}（本地处理 {prefilter_stats['resolved_rate']:.1%}）\n"
+        f"自动回复缓存: {autoreply_stats['size']} 条，命中率 {autoreply_stats['hit_rate']:.1%}（知识库版本 {db.get_knowledge_version()}）\n"
+        f"验证题目池: {pool_stats['size']}/{pool_stats['max_size']}，命中率 {pool_stats['hit_rate']:.1%}，补充速率 {pool_stats['refill_per_minute']:.1f} 道/分钟\n\n"
+        f"Gemini 熔断器: {STATE_NAMES[breaker['state']]}，连续失败 {breaker['consecutive_failures']}，"
+        f"累计熔断 {breaker['trips']} 次，跳过调用 {breaker['rejected']} 次\n"
+        f"{latency_lines}"
+        f"批量审查: {'已启用' if batch_stats['enabled'] else '未启用'}，{batch_stats['batches']} 批 {batch_stats['items']} 条，"
+        f"节省调用 {batch_stats['calls_saved']} 次，逐条回退 {batch_stats['fallbacks']} 条\n\n"
         f"请选择要查看的列表："
     )
+
+@admin_only
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    stats_message = await build_stats_message()
     
     keyboard = [
         [InlineKeyboardButton("所有用户列表", callback_data="stats_list_all_users_page_1")],
@@ -138,7 +190,7 @@ async def panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     total_users = await db.get_total_users_count()
     blocked_users = await db.get_blocked_users_count()
     exempted_users = await db.get_exemptions_count()
-    is_enabled = await db.get_autoreply_enabled()
+    is_enabled = bot_settings.autoreply_enabled()
     
     message = (
         f"管理面板\n\n"
@@ -154,7 +206,8 @@ async def panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("黑名单管理", callback_data="panel_blacklist_page_1"), InlineKeyboardButton("所有用户信息", callback_data="panel_stats")],
         [InlineKeyboardButton("被过滤消息", callback_data="panel_filtered_page_1"), InlineKeyboardButton("自动回复管理", callback_data="panel_autoreply")],
         [InlineKeyboardButton("豁免名单管理", callback_data="panel_exemptions_page_1"), InlineKeyboardButton("网络测试管理", callback_data="panel_network_test")],
-        [InlineKeyboardButton("RSS 功能管理", callback_data="panel_rss")],
+        [InlineKeyboardButton("RSS 功能管理", callback_data="panel_rss"), InlineKeyboardButton("本地预过滤", callback_data="panel_prefilter")],
+        [InlineKeyboardButton("系统设置", callback_data="panel_settings")],
     ]
     
     await update.message.reply_text(
@@ -310,7 +363,7 @@ async def exempt(update: Update, context: ContextTypes.DEFAULT_TYPE):
 @admin_only
 async def autoreply(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
-        is_enabled = await db.get_autoreply_enabled()
+        is_enabled = bot_settings.autoreply_enabled()
         status_text = "已启用" if is_enabled else "已禁用"
         
         message = (
@@ -340,10 +393,10 @@ async def autoreply(update: Update, context: ContextTypes.DEFAULT_TYPE):
     subcommand = context.args[0].lower()
     
     if subcommand == "on":
-        await db.set_autoreply_enabled(True)
+        await bot_settings.set('autoreply_enabled', True)
         await update.message.reply_text("自动回复已开启")
     elif subcommand == "off":
-        await db.set_autoreply_enabled(False)
+        await bot_settings.set('autoreply_enabled', False)
         await update.message.reply_text("自动回复已关闭")
     elif subcommand == "add":
         if len(context.args) < 3:
@@ -423,3 +476,99 @@ async def autoreply(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "/autoreply delete <ID> - 删除知识条目\n"
             "/autoreply list - 列出所有知识条目"
         )
+
+@admin_only
+async def prefilter(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        stats = spam_prefilter.stats()
+        await update.message.reply_text(
+            f"本地预过滤\n\n"
+            f"当前状态: {'已启用' if stats['enabled'] else '已关闭'}\n"
+            f"规则数量: {stats['rules']}\n"
+            f"本地处理占比: {stats['resolved_rate']:.1%}\n\n"
+            f"用法:\n"
+            f"/prefilter on|off - 开启或关闭本地预过滤\n"
+            f"/prefilter add <domain|keyword|regex> <内容> - 添加规则\n"
+            f"/prefilter remove <ID> - 删除规则\n"
+            f"/prefilter list - 列出所有规则"
+        )
+        return
+    
+    subcommand = context.args[0].lower()
+    
+    if subcommand in ("on", "off"):
+        await spam_prefilter.set_enabled(subcommand == "on")
+        await update.message.reply_text(f"本地预过滤已{'开启' if subcommand == 'on' else '关闭'}")
+    elif subcommand == "add":
+        if len(context.args) < 3:
+            await update.message.reply_text(
+                "用法: /prefilter add <domain|keyword|regex> <内容>\n\n"
+                "示例: /prefilter add domain example.com"
+            )
+            return
+        
+        rule_type = context.args[1].lower()
+        pattern = " ".join(context.args[2:])
+        _, response = await spam_prefilter.add_rule(rule_type, pattern, update.effective_user.id)
+        await update.message.reply_text(response)
+    elif subcommand == "remove":
+        try:
+            rule_id = int(context.args[1])
+        except (ValueError, IndexError):
+            await update.message.reply_text("用法: /prefilter remove <ID>")
+            return
+        
+        if await spam_prefilter.remove_rule(rule_id):
+            await update.message.reply_text(f"已删除规则 #{rule_id}")
+        else:
+            await update.message.reply_text(f"规则ID {rule_id} 不存在")
+    elif subcommand == "list":
+        if not spam_prefilter.rules:
+            await update.message.reply_text("当前没有任何本地过滤规则")
+            return
+        
+        message = "本地过滤规则:\n\n"
+        for rule in spam_prefilter.rules:
+            message += f"ID {rule['id']} [{rule['rule_type']}] {rule['pattern']}\n"
+        
+        await update.message.reply_text(message)
+    else:
+        await update.message.reply_text("未知的子命令，发送 /prefilter 查看用法。")
+
+@admin_only
+async def setting(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if len(context.args) < 2:
+        message = "运行时设置:\n\n"
+        for key in SETTING_DEFAULTS:
+            value = bot_settings.get(key)
+            if isinstance(value, bool):
+                value = "已启用" if value else "已关闭"
+            message += f"{key} ({SETTING_NAMES[key]}): {value}\n"
+        message += "\n用法: /setting <名称> <值>\n示例: /setting max_message_length 2000"
+        await update.message.reply_text(message)
+        return
+    
+    key = context.args[0]
+    raw_value = context.args[1].lower()
+    if key not in SETTING_DEFAULTS:
+        await update.message.reply_text(f"未知的设置项: {key}")
+        return
+    
+    default = SETTING_DEFAULTS[key]
+    if isinstance(default, bool):
+        if raw_value not in ("on", "off", "1", "0", "true", "false"):
+            await update.message.reply_text("开关类设置的值必须为 on 或 off。")
+            return
+        value = raw_value in ("on", "1", "true")
+    else:
+        try:
+            value = int(raw_value)
+        except ValueError:
+            await update.message.reply_text("数值类设置的值必须为正整数。")
+            return
+        if value <= 0:
+            await update.message.reply_text("数值类设置的值必须为正整数。")
+            return
+    
+    await bot_settings.set(key, value)
+    await update.message.reply_text(f"已将 {SETTING_NAMES[key]} 设置为 {context.args[1]}")
@@ -1,17 +1,98 @@
+import asyncio
+from contextlib import aclosing
 from telegram import Update
 from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 from database import models as db
 from services.verification import create_verification, is_verification_pending, get_pending_verification_message
 from services.thread_manager import get_or_create_thread
-from services.gemini_service import gemini_service
+from services.gemini_service import gemini_service, is_refusal
+from services.prefilter import spam_prefilter
 from utils.media_converter import sticker_to_image
-from utils.message_sender import send_message_by_type
+from utils.message_sender import send_message_by_type, get_media_info
 from services.rate_limiter import rate_limiter
+from services.ingress_queue import ingress_queue
+from services.autoreply_cache import autoreply_cache
+from services.settings import bot_settings
 from config import config
 
+async def _get_topic_reply_target(message):
+    if not message.reply_to_message:
+        return None
+    return await db.get_topic_message_id(message.chat_id, message.reply_to_message.message_id)
+
+async def _log_incoming_message(message, thread_id: int, sent_msg, reply_to_message_id: int = None):
+    media_type, media_file_id = get_media_info(message)
+    await db.save_message(
+        user_id=message.chat_id,
+        message_id=message.message_id,
+        content=message.text or message.caption,
+        direction="incoming",
+        media_type=media_type,
+        media_file_id=media_file_id,
+        thread_id=thread_id,
+        forwarded_message_id=sent_msg.message_id if sent_msg else None,
+        reply_to_message_id=reply_to_message_id
+    )
+
 async def _resend_message(update: Update, context: ContextTypes.DEFAULT_TYPE, thread_id: int):
-    await send_message_by_type(context.bot, update.message, config.FORUM_GROUP_ID, thread_id, True)
+    message = update.message
+    reply_to_message_id = await _get_topic_reply_target(message)
+    sent_msg = await send_message_by_type(
+        context.bot, message, config.FORUM_GROUP_ID, thread_id, True,
+        reply_to_message_id=reply_to_message_id
+    )
+    await _log_incoming_message(message, thread_id, sent_msg, reply_to_message_id)
+    return sent_msg
+
+async def _stream_autoreply(message):
+    loop = asyncio.get_running_loop()
+    sent = None
+    reply = ""
+    last_edit = 0.0
+    try:
+        async with aclosing(autoreply_cache.stream(message.text)) as stream:
+            async for reply in stream:
+                if is_refusal(reply):
+                    break
+                if sent is None:
+                    if len(reply) >= config.AUTOREPLY_STREAM_MIN_CHARS:
+                        try:
+                            sent = await message.reply_text(reply)
+                        except Exception as e:
+                            print(f"发送流式自动回复失败，稍后重试: {e}")
+                        last_edit = loop.time()
+                elif loop.time() - last_edit >= config.AUTOREPLY_STREAM_EDIT_INTERVAL:
+                    try:
+                        await sent.edit_text(reply)
+                    except Exception as e:
+                        print(f"更新流式自动回复失败，跳过本次编辑: {e}")
+                    last_edit = loop.time()
+    except Exception as e:
+        print(f"流式自动回复生成失败: {e}")
+        reply = ""
+
+    reply = reply.strip()
+    if not reply or is_refusal(reply):
+        if sent:
+            try:
+                await sent.delete()
+            except Exception as e:
+                print(f"删除未完成的自动回复失败: {e}")
+        return None, False
+    if sent is None:
+        return reply, False
+
+    try:
+        await sent.edit_text(reply, parse_mode='Markdown')
+    except Exception as e:
+        if "not modified" not in str(e):
+            print(f"Markdown解析失败，使用纯文本: {e}")
+            try:
+                await sent.edit_text(reply)
+            except Exception:
+                pass
+    return reply, True
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     from network_test.handlers import handle_message as network_handle_message
@@ -50,9 +131,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if context.user_data['pending_update'].update_id == update.update_id:
             context.user_data.pop('pending_update')
     
-    is_blocked, is_permanent = await db.is_blacklisted(user.id)
-    if is_blocked:
-        if is_permanent:
+    gate = await db.get_user_gate(user.id)
+    if gate['is_blacklisted']:
+        if gate['is_permanent']:
             await update.message.reply_text("你已被永久封禁，如有疑问请联系管理员。")
             return
         
@@ -68,9 +149,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(message)
         return
     
-    user_data = await db.get_user(user.id)
+    is_verified = gate['is_verified']
     
-    if not user_data:
+    if not gate['user']:
         await db.add_user(
             user_id=user.id,
             username=user.username,
@@ -85,10 +166,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "不过，在你发送第一条消息前，请先完成人机验证。"
         )
         await update.message.reply_text(welcome_message)
-        user_data = await db.get_user(user.id)
 
-    if not user_data.get('is_verified'):
-        if not config.VERIFICATION_ENABLED:
+    max_length = bot_settings.max_message_length()
+    if len(update.message.text or update.message.caption or "") > max_length:
+        await update.message.reply_text(f"消息过长，未被转发。当前允许的最大长度为 {max_length} 个字符。")
+        return
+
+    if not is_verified:
+        if not bot_settings.verification_enabled():
             await db.update_user_verification(user.id, is_verified=True)
         else:
             has_pending, is_expired = is_verification_pending(user.id)
@@ -123,10 +208,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if message.video or message.animation:
         pass
-    else:
-        is_exempted = await db.is_exempted(user.id)
-        
-        if not is_exempted:
+    elif not gate['is_exempted']:
+        analyzing_message = None
+        analysis_result = spam_prefilter.check(message, user.id, image_bytes)
+        if analysis_result is None and gemini_service.is_filter_enabled():
+            if not ingress_queue.allow_low_priority():
+                await message.reply_text("当前消息较多，系统繁忙，您的消息暂未转发，请稍后重新发送。")
+                return
             analyzing_message = await context.bot.send_message(
                 chat_id=message.chat_id,
                 text="正在通过AI分析内容是否包含垃圾信息...",
@@ -134,20 +222,24 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
 
             analysis_result = await gemini_service.analyze_message(message, image_bytes)
-            if analysis_result.get("is_spam"):
-                await db.save_filtered_message(
-                    user_id=user.id,
-                    message_id=message.message_id,
-                    content=message.text or message.caption,
-                    reason=analysis_result.get("reason"),
-                    media_type=message.photo and "photo" or message.sticker and "sticker",
-                    media_file_id=message.photo and message.photo[-1].file_id or message.sticker and message.sticker.file_id,
-                )
-                reason = analysis_result.get("reason", "未提供原因")
-                await analyzing_message.edit_text(f"您的消息已被系统拦截，因此未被转发\n\n原因：{reason}")
-                return
+        if analysis_result and analysis_result.get("is_spam"):
+            await db.save_filtered_message(
+                user_id=user.id,
+                message_id=message.message_id,
+                content=message.text or message.caption,
+                reason=analysis_result.get("reason"),
+                media_type=message.photo and "photo" or message.sticker and "sticker",
+                media_file_id=message.photo and message.photo[-1].file_id or message.sticker and message.sticker.file_id,
+            )
+            reason = analysis_result.get("reason", "未提供原因")
+            blocked_text = f"您的消息已被系统拦截，因此未被转发\n\n原因：{reason}"
+            if analyzing_message:
+                await analyzing_message.edit_text(blocked_text)
             else:
-                await analyzing_message.delete()
+                await message.reply_text(blocked_text)
+            return
+        elif analyzing_message:
+            await analyzing_message.delete()
 
     thread_id, is_new = await get_or_create_thread(update, context)
     if not thread_id:
@@ -160,14 +252,18 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         if message.text:
+            reply_to_message_id = await _get_topic_reply_target(message)
             sent_msg = await context.bot.send_message(
                 chat_id=config.FORUM_GROUP_ID,
                 text=message.text,
                 entities=message.entities,
                 message_thread_id=thread_id,
-                disable_web_page_preview=True
+                disable_web_page_preview=True,
+                reply_to_message_id=reply_to_message_id,
+                allow_sending_without_reply=True
             )
             forwarded_message_id = sent_msg.message_id
+            await _log_incoming_message(message, thread_id, sent_msg, reply_to_message_id)
         else:
             await _resend_message(update, context, thread_id)
             return
@@ -191,15 +287,17 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("发送消息时发生未知错误，请稍后再试。")
             return
     
-    if message.text and await db.get_autoreply_enabled():
-        knowledge_base_content = await db.get_all_knowledge_content()
-        if knowledge_base_content:
-            autoreply_text = await gemini_service.generate_autoreply(
-                message.text,
-                knowledge_base_content
-            )
-            
-            if autoreply_text:
+    if message.text and bot_settings.autoreply_enabled():
+        autoreply_text = autoreply_cache.lookup(message.text)
+        streamed = False
+        if autoreply_text is None and gemini_service.is_available() and ingress_queue.allow_low_priority():
+            if config.AUTOREPLY_STREAMING:
+                autoreply_text, streamed = await _stream_autoreply(message)
+            else:
+                autoreply_text = await autoreply_cache.generate(message.text)
+        
+        if autoreply_text:
+            if not streamed:
                 try:
                     await update.message.reply_text(
                         autoreply_text,
@@ -209,31 +307,31 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     print(f"Markdown解析失败，使用纯文本: {e}")
                     await update.message.reply_text(autoreply_text)
                 
-                if forwarded_message_id:
-                    admin_notification = (
-                        f"自动回复内容:\n\n"
-                        f"{autoreply_text}"
+            if forwarded_message_id:
+                admin_notification = (
+                    f"自动回复内容:\n\n"
+                    f"{autoreply_text}"
+                )
+                try:
+                    await context.bot.send_message(
+                        chat_id=config.FORUM_GROUP_ID,
+                        text=admin_notification,
+                        message_thread_id=thread_id,
+                        reply_to_message_id=forwarded_message_id,
+                        parse_mode='Markdown'
                     )
+                except Exception as e:
+                    print(f"发送自动回复通知给管理员失败（Markdown），尝试纯文本: {e}")
                     try:
+                        admin_notification_plain = (
+                            f"自动回复内容:\n\n"
+                            f"{autoreply_text}"
+                        )
                         await context.bot.send_message(
                             chat_id=config.FORUM_GROUP_ID,
-                            text=admin_notification,
+                            text=admin_notification_plain,
                             message_thread_id=thread_id,
-                            reply_to_message_id=forwarded_message_id,
-                            parse_mode='Markdown'
+                            reply_to_message_id=forwarded_message_id
                         )
-                    except Exception as e:
-                        print(f"发送自动回复通知给管理员失败（Markdown），尝试纯文本: {e}")
-                        try:
-                            admin_notification_plain = (
-                                f"自动回复内容:\n\n"
-                                f"{autoreply_text}"
-                            )
-                            await context.bot.send_message(
-                                chat_id=config.FORUM_GROUP_ID,
-                                text=admin_notification_plain,
-                                message_thread_id=thread_id,
-                                reply_to_message_id=forwarded_message_id
-                            )
-                        except Exception as e2:
-                            print(f"发送自动回复通知给管理员失败: {e2}")
+                    except Exception as e2:
+                        print(f"发送自动回复通知给管理员失败: {e2}")
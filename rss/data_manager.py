@@ -1,12 +1,17 @@
+import asyncio
 import json
 import os
 import logging
+import tempfile
 from typing import Dict, Optional, Any
 import feedparser
+from config import config
 
 logger = logging.getLogger(__name__)
 
 subscriptions_data: Dict[str, Dict[str, Any]] = {}
+_dirty_data_file: Optional[str] = None
+_flush_handle: Optional[asyncio.TimerHandle] = None
 
 
 def get_feed_title(feed_url: str) -> Optional[str]:
@@ -25,6 +30,8 @@ def _ensure_feed_data_structure(feed_data: Dict[str, Any], feed_url: str) -> Non
         feed_data["keywords"] = []
     if "last_entry_id" not in feed_data:
         feed_data["last_entry_id"] = None
+    feed_data.setdefault("etag", None)
+    feed_data.setdefault("modified", None)
     if "title" not in feed_data:
         feed_data["title"] = get_feed_title(feed_url) or "未知标题"
 
@@ -69,25 +76,87 @@ def load_subscriptions(data_file: str) -> Dict[str, Dict[str, Any]]:
     return subscriptions_data
 
 
-def save_subscriptions(data_file: str) -> None:
-    global subscriptions_data
+def _write_subscriptions(data_file: str) -> None:
+    data_dir = os.path.dirname(data_file)
+    if data_dir:
+        os.makedirs(data_dir, exist_ok=True)
 
     try:
-        data_dir = os.path.dirname(data_file)
-        if data_dir:
-            os.makedirs(data_dir, exist_ok=True)
+        mode = os.stat(data_file).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
 
-        with open(data_file, "w", encoding="utf-8") as file:
-            json.dump(subscriptions_data, file, indent=4, ensure_ascii=False)
+    fd, temp_path = tempfile.mkstemp(prefix=".rss_subscriptions_", suffix=".tmp", dir=data_dir or ".")
+    try:
+        os.chmod(temp_path, mode)
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(subscriptions_data, file, ensure_ascii=False, separators=(",", ":"))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, data_file)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def flush_subscriptions() -> None:
+    global _dirty_data_file, _flush_handle
+
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    if _dirty_data_file is None:
+        return
+
+    data_file, _dirty_data_file = _dirty_data_file, None
+    try:
+        _write_subscriptions(data_file)
         logger.debug("订阅已成功保存到 %s", data_file)
     except Exception as exc:
+        _dirty_data_file = _dirty_data_file or data_file
         logger.error("保存订阅到 %s 时出错: %s", data_file, exc)
 
 
+def save_subscriptions(data_file: str) -> None:
+    global _dirty_data_file, _flush_handle
+
+    _dirty_data_file = data_file
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        flush_subscriptions()
+        return
+    if _flush_handle is None:
+        _flush_handle = loop.call_later(config.RSS_SAVE_DELAY, flush_subscriptions)
+
+
 def get_subscriptions() -> Dict[str, Dict[str, Any]]:
     return subscriptions_data
 
 
+def update_feed_validators(
+    feed_url: str,
+    chat_ids: list,
+    etag: Optional[str],
+    modified: Optional[str],
+    data_file: str,
+) -> None:
+    changed = False
+    for chat_id in chat_ids:
+        feed_data = subscriptions_data.get(chat_id, {}).get("rss_feeds", {}).get(feed_url)
+        if feed_data is None:
+            continue
+        if feed_data.get("etag") != etag or feed_data.get("modified") != modified:
+            feed_data["etag"] = etag
+            feed_data["modified"] = modified
+            changed = True
+    if changed:
+        save_subscriptions(data_file)
+
+
 def remove_feed(chat_id: str, feed_url: str, data_file: str) -> bool:
     if chat_id not in subscriptions_data:
         return False
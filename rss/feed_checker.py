@@ -1,11 +1,12 @@
 import asyncio
 import logging
-import feedparser
 from typing import Dict, Any, Optional
 from telegram.ext import ContextTypes
 from telegram import constants
 from config import config
 from . import data_manager, retry_utils, settings
+from .fetcher import feed_fetcher
+from .parser import feed_parser_pool
 
 logger = logging.getLogger(__name__)
 
@@ -63,35 +64,49 @@ def _update_last_entry_id(
         data_manager.save_subscriptions(data_file)
 
 
-async def check_single_feed(
+def _get_validators(subscribers: list) -> Dict[str, Optional[str]]:
+    if any(feed_config.get("last_entry_id") is None for _, feed_config in subscribers):
+        return {"etag": None, "modified": None}
+    _, feed_config = subscribers[0]
+    return {"etag": feed_config.get("etag"), "modified": feed_config.get("modified")}
+
+
+async def fetch_feed(feed_url: str, etag: Optional[str] = None, modified: Optional[str] = None):
+    logger.info("正在获取订阅源: %s", feed_url)
+    response = await feed_fetcher.fetch(feed_url, etag=etag, modified=modified)
+    if response["status"] == 304:
+        logger.info("订阅源 %s 未修改 (304)，跳过解析。", feed_url)
+        return None
+
+    feed_content = await feed_parser_pool.parse(response["content"], response["headers"])
+    feed_content["etag"] = response["etag"]
+    feed_content["modified"] = response["modified"]
+
+    if feed_content["bozo"]:
+        logger.warning(
+            "订阅源 %s 可能格式错误。Bozo 标记: %s",
+            feed_url,
+            feed_content["bozo_exception"],
+        )
+    return feed_content
+
+
+async def process_feed_for_subscriber(
     context: ContextTypes.DEFAULT_TYPE,
     chat_id: str,
     feed_url: str,
     feed_config: Dict[str, Any],
+    feed_content,
     data_file: str,
 ) -> None:
-    logger.info("正在为用户 %s 检查订阅源: %s", chat_id, feed_url)
+    logger.debug("正在为用户 %s 处理订阅源: %s", chat_id, feed_url)
 
     try:
-        if hasattr(asyncio, "to_thread"):
-            feed_content = await asyncio.to_thread(feedparser.parse, feed_url)
-        else:
-            loop = asyncio.get_event_loop()
-            feed_content = await loop.run_in_executor(None, feedparser.parse, feed_url)
-
-        if feed_content.bozo:
-            logger.warning(
-                "用户 %s 的订阅源 %s 可能格式错误。Bozo 标记: %s",
-                chat_id,
-                feed_url,
-                feed_content.bozo_exception,
-            )
-
         last_known_entry_id = feed_config.get("last_entry_id")
         current_feed_latest_entry_id = None
 
-        if feed_content.entries:
-            latest_entry = feed_content.entries[0]
+        if feed_content["entries"]:
+            latest_entry = feed_content["entries"][0]
             current_feed_latest_entry_id = _get_entry_id(latest_entry)
 
         if last_known_entry_id is None:
@@ -108,7 +123,7 @@ async def check_single_feed(
         temp_new_entries = []
         found_last_known = False
 
-        for entry in feed_content.entries:
+        for entry in feed_content["entries"]:
             entry_id = _get_entry_id(entry)
             if not entry_id:
                 logger.warning("%s 中的条目缺少 'id' 和 'link'。正在跳过。", feed_url)
@@ -212,6 +227,49 @@ async def check_single_feed(
         logger.error("处理用户 %s 的订阅源 %s 时出错: %s", chat_id, feed_url, exc, exc_info=True)
 
 
+def _subscribers_caught_up(feed_url: str, chat_ids: list, entries: list) -> bool:
+    latest_entry_id = next((entry_id for entry_id in map(_get_entry_id, entries) if entry_id), None)
+    if latest_entry_id is None:
+        return True
+
+    subscriptions_data = data_manager.get_subscriptions()
+    for chat_id in chat_ids:
+        feed_data = subscriptions_data.get(chat_id, {}).get("rss_feeds", {}).get(feed_url)
+        if feed_data is not None and feed_data.get("last_entry_id") != latest_entry_id:
+            return False
+    return True
+
+
+async def check_feed_url(
+    context: ContextTypes.DEFAULT_TYPE,
+    feed_url: str,
+    subscribers: list,
+    data_file: str,
+) -> None:
+    try:
+        feed_content = await fetch_feed(feed_url, **_get_validators(subscribers))
+    except Exception as exc:
+        logger.error("获取订阅源 %s 时出错 (%s 个订阅者): %s", feed_url, len(subscribers), exc, exc_info=True)
+        return
+
+    if feed_content is None:
+        return
+
+    await asyncio.gather(*(
+        process_feed_for_subscriber(context, chat_id, feed_url, feed_config, feed_content, data_file)
+        for chat_id, feed_config in subscribers
+    ))
+
+    chat_ids = [chat_id for chat_id, _ in subscribers]
+    if _subscribers_caught_up(feed_url, chat_ids, feed_content["entries"]):
+        data_manager.update_feed_validators(
+            feed_url, chat_ids, feed_content["etag"], feed_content["modified"], data_file
+        )
+    else:
+        logger.info("订阅源 %s 仍有订阅者未同步到最新条目，下次检查将完整获取。", feed_url)
+        data_manager.update_feed_validators(feed_url, chat_ids, None, None, data_file)
+
+
 async def check_feeds_job(context: ContextTypes.DEFAULT_TYPE) -> None:
     if not settings.is_enabled():
         logger.debug("RSS 功能已关闭，跳过本次检查任务。")
@@ -229,29 +287,37 @@ async def check_feeds_job(context: ContextTypes.DEFAULT_TYPE) -> None:
         logger.info("没有要检查的订阅。")
         return
 
-    all_feed_checks = []
+    subscribers_by_url: Dict[str, list] = {}
     for chat_id, user_data in list(subscriptions_data.items()):
         feeds = user_data.get("rss_feeds", {})
         for feed_url, feed_config in list(feeds.items()):
-            all_feed_checks.append(
-                check_single_feed(context, chat_id, feed_url, dict(feed_config), data_file)
-            )
+            subscribers_by_url.setdefault(feed_url, []).append((chat_id, dict(feed_config)))
 
-    if not all_feed_checks:
+    if not subscribers_by_url:
         logger.info("在 subscriptions_data 中未找到要检查的订阅源。")
         return
 
-    logger.info("已计划 %s 个订阅源检查，将并发执行。", len(all_feed_checks))
-    results = await asyncio.gather(*all_feed_checks, return_exceptions=True)
+    feed_urls = list(subscribers_by_url)
+    subscription_count = sum(len(subscribers) for subscribers in subscribers_by_url.values())
+    logger.info(
+        "已计划 %s 个订阅源检查（共 %s 个订阅），将并发执行。",
+        len(feed_urls),
+        subscription_count,
+    )
+    results = await asyncio.gather(
+        *(check_feed_url(context, feed_url, subscribers_by_url[feed_url], data_file) for feed_url in feed_urls),
+        return_exceptions=True,
+    )
+
+    data_manager.flush_subscriptions()
 
     error_count = 0
-    for idx, result in enumerate(results):
+    for feed_url, result in zip(feed_urls, results):
         if isinstance(result, Exception):
             error_count += 1
-            logger.error("订阅源检查任务 %s 失败: %s", idx, result)
+            logger.error("订阅源 %s 的检查任务失败: %s", feed_url, result)
 
     if error_count > 0:
-        logger.warning("此周期有 %s/%s 个订阅源检查失败。", error_count, len(all_feed_checks))
+        logger.warning("此周期有 %s/%s 个订阅源检查失败。", error_count, len(feed_urls))
     else:
         logger.info("此周期的所有订阅源检查已完成。")
-
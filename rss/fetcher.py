@@ -0,0 +1,81 @@
+import logging
+from typing import Any, Dict, Optional
+import aiohttp
+from config import config
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; TelegramRSSBot/1.0)"
+
+
+class FeedTooLargeError(Exception):
+    pass
+
+
+class FeedFetcher:
+    def __init__(self, timeout: float, max_bytes: int, max_concurrency: int, per_host_concurrency: int):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host_concurrency = max(1, per_host_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.per_host_concurrency,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(sock_connect=self.timeout, sock_read=self.timeout),
+                headers={"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"},
+            )
+        return self._session
+
+    async def fetch(self, url: str, etag: Optional[str] = None, modified: Optional[str] = None) -> Dict[str, Any]:
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+
+        async with self._get_session().get(url, headers=headers) as response:
+            result = {
+                "status": response.status,
+                "content": b"",
+                "etag": response.headers.get("ETag") or etag,
+                "modified": response.headers.get("Last-Modified") or modified,
+                "headers": {
+                    "content-type": response.headers.get("Content-Type", ""),
+                    "content-location": str(response.url),
+                },
+            }
+            if response.status == 304:
+                return result
+            response.raise_for_status()
+
+            if response.content_length and response.content_length > self.max_bytes:
+                raise FeedTooLargeError(f"订阅源内容过大 ({response.content_length} 字节): {url}")
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(65536):
+                body.extend(chunk)
+                if len(body) > self.max_bytes:
+                    raise FeedTooLargeError(f"订阅源内容超过 {self.max_bytes} 字节: {url}")
+            result["content"] = bytes(body)
+            return result
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("RSS 抓取会话已关闭。")
+        self._session = None
+
+
+feed_fetcher = FeedFetcher(
+    config.RSS_FETCH_TIMEOUT,
+    config.RSS_FETCH_MAX_BYTES,
+    config.RSS_FETCH_CONCURRENCY,
+    config.RSS_FETCH_PER_HOST,
+)
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+import feedparser
+from config import config
+
+logger = logging.getLogger(__name__)
+
+ENTRY_FIELDS = ("id", "link", "title", "summary")
+
+
+def parse_feed_content(content: bytes, response_headers: Dict[str, str]) -> Dict[str, Any]:
+    feed = feedparser.parse(content, response_headers=response_headers)
+    return {
+        "bozo": bool(feed.bozo),
+        "bozo_exception": str(feed.get("bozo_exception")) if feed.bozo else None,
+        "entries": [
+            {field: entry[field] for field in ENTRY_FIELDS if field in entry}
+            for entry in feed.entries
+        ],
+    }
+
+
+class FeedParserPool:
+    def __init__(self, workers: int):
+        self.workers = max(0, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info("RSS 解析进程池已启动，进程数 %s。", self.workers)
+        return self._executor
+
+    async def parse(self, content: bytes, response_headers: Dict[str, str]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        if self.workers:
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, parse_feed_content, content, response_headers)
+            except BrokenProcessPool as exc:
+                logger.error("RSS 解析进程池异常，将重建并改用线程解析本次内容: %s", exc)
+                executor.shutdown(wait=False, cancel_futures=True)
+                if self._executor is executor:
+                    self._executor = None
+        return await loop.run_in_executor(None, parse_feed_content, content, response_headers)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("RSS 解析进程池已关闭。")
+
+
+feed_parser_pool = FeedParserPool(config.RSS_PARSE_WORKERS)
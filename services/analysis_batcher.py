@@ -0,0 +1,83 @@
+import asyncio
+import logging
+
+class AnalysisBatcher:
+    def __init__(self, enabled: bool, window_ms: int, max_size: int, classify_batch, classify_single):
+        self.enabled = enabled
+        self.window = max(0, window_ms) / 1000
+        self.max_size = max(2, max_size)
+        self.batches = 0
+        self.items = 0
+        self.calls_saved = 0
+        self.fallbacks = 0
+        self._classify_batch = classify_batch
+        self._classify_single = classify_single
+        self._pending = {}
+        self._timer = None
+        self._flushes = set()
+
+    async def submit(self, key: str, text: str) -> dict:
+        loop = asyncio.get_running_loop()
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = (text, [])
+        future = loop.create_future()
+        entry[1].append(future)
+
+        if len(self._pending) >= self.max_size:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._schedule_flush)
+        return await future
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            batch, self._pending = self._pending, {}
+            task = asyncio.create_task(self._flush(list(batch.values())))
+            self._flushes.add(task)
+            task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task):
+        self._flushes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"批量内容审查任务异常: {task.exception()}")
+
+    async def _flush(self, batch):
+        texts = [text for text, _ in batch]
+        waiting = sum(len(futures) for _, futures in batch)
+        self.batches += 1
+        self.items += waiting
+        requests = 1
+        try:
+            if len(texts) == 1:
+                verdicts = [await self._classify_single(texts[0])]
+            else:
+                verdicts = await self._classify_batch(texts)
+                missing = [i for i, verdict in enumerate(verdicts) if verdict is None]
+                if missing:
+                    requests += len(missing)
+                    self.fallbacks += len(missing)
+                    retried = await asyncio.gather(*(self._classify_single(texts[i]) for i in missing))
+                    for i, verdict in zip(missing, retried):
+                        verdicts[i] = verdict
+        except Exception as e:
+            logging.error(f"批量内容审查失败（{len(texts)} 条）: {e}")
+            verdicts = [None] * len(texts)
+        self.calls_saved += max(0, waiting - requests)
+
+        for (_, futures), verdict in zip(batch, verdicts):
+            for future in futures:
+                if not future.done():
+                    future.set_result(dict(verdict) if verdict else None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "batches": self.batches,
+            "items": self.items,
+            "calls_saved": self.calls_saved,
+            "fallbacks": self.fallbacks,
+        }
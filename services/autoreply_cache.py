@@ -0,0 +1,71 @@
+import asyncio
+from contextlib import aclosing
+from config import config
+from database import models as db
+from services.gemini_service import gemini_service, is_refusal
+from services.verdict_cache import normalize_text
+from utils.lru_cache import TTLCache
+
+class AutoreplyCache:
+    def __init__(self, max_size: int, ttl: int):
+        self._cache = TTLCache(max_size, ttl)
+        self._pending = {}
+
+    def _key(self, question: str):
+        return (normalize_text(question), db.get_knowledge_version())
+
+    def lookup(self, question: str) -> str:
+        return self._cache.get(self._key(question))
+
+    async def generate(self, question: str) -> str:
+        key = self._key(question)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.create_task(self._generate(question, key))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(pending)
+
+    async def _generate(self, question: str, key) -> str:
+        knowledge_base_content = await db.get_relevant_knowledge_content(question)
+        if not knowledge_base_content:
+            return None
+        reply = await gemini_service.generate_autoreply(question, knowledge_base_content)
+        if reply and key[1] == db.get_knowledge_version():
+            self._cache.set(key, reply)
+        return reply
+
+    async def stream(self, question: str):
+        key = self._key(question)
+        pending = self._pending.get(key)
+        if pending is not None:
+            reply = await asyncio.shield(pending)
+            if reply:
+                yield reply
+            return
+
+        leader = asyncio.get_running_loop().create_future()
+        self._pending[key] = leader
+        final = None
+        try:
+            knowledge_base_content = await db.get_relevant_knowledge_content(question)
+            if not knowledge_base_content:
+                return
+            reply = ""
+            async with aclosing(gemini_service.stream_autoreply(question, knowledge_base_content)) as deltas:
+                async for delta in deltas:
+                    reply += delta
+                    yield reply
+            reply = reply.strip()
+            if reply and not is_refusal(reply):
+                final = reply
+                if key[1] == db.get_knowledge_version():
+                    self._cache.set(key, reply)
+        finally:
+            self._pending.pop(key, None)
+            leader.set_result(final)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+autoreply_cache = AutoreplyCache(config.AUTOREPLY_CACHE_SIZE, config.AUTOREPLY_CACHE_TTL)
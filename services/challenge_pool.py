@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from config import config
+from services.gemini_service import gemini_service, build_challenge, LOCAL_VERIFICATION_QUESTIONS
+from services.verdict_cache import normalize_text
+
+CALLBACK_DATA_LIMIT = 64
+CALLBACK_PREFIXES = ("verify_", "unblock_")
+MAX_QUESTION_LENGTH = 200
+RATE_WINDOW = 600
+
+def validate_challenge(data) -> dict:
+    if not isinstance(data, dict):
+        return None
+    question = data.get('question')
+    correct_answer = data.get('correct_answer')
+    incorrect_answers = data.get('incorrect_answers')
+    if not isinstance(question, str) or not isinstance(correct_answer, str) or not isinstance(incorrect_answers, list):
+        return None
+    question = question.strip()
+    options = [correct_answer.strip()] + [str(answer).strip() for answer in incorrect_answers]
+    if not question or len(question) > MAX_QUESTION_LENGTH or len(options) != 4:
+        return None
+    if not all(options) or len({normalize_text(option) for option in options}) != len(options):
+        return None
+    prefix_length = max(len(prefix) for prefix in CALLBACK_PREFIXES)
+    if any(len(option.encode('utf-8')) + prefix_length > CALLBACK_DATA_LIMIT for option in options):
+        return None
+    return {"question": question, "correct_answer": options[0], "incorrect_answers": options[1:]}
+
+class ChallengePool:
+    def __init__(self, max_size: int, low_watermark: int, refill_interval: int, concurrency: int):
+        self.max_size = max(1, max_size)
+        self.low_watermark = min(max(0, low_watermark), self.max_size)
+        self.refill_interval = max(1, refill_interval)
+        self.concurrency = max(1, concurrency)
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.rejected = 0
+        self.failed = 0
+        self._pool = deque()
+        self._keys = set()
+        self._recent = deque(maxlen=self.max_size * 4)
+        self._generated_at = deque()
+        self._wake = None
+        self._worker = None
+
+    def __len__(self):
+        return len(self._pool)
+
+    def start(self):
+        if not gemini_service.client or (self._worker and not self._worker.done()):
+            return
+        self._wake = asyncio.Event()
+        self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def pop(self) -> dict:
+        if self._pool:
+            data = self._pool.popleft()
+            key = normalize_text(data['question'])
+            self._keys.discard(key)
+            self._recent.append(key)
+            self.hits += 1
+            challenge = build_challenge(data)
+        else:
+            self.misses += 1
+            challenge = build_challenge(random.choice(LOCAL_VERIFICATION_QUESTIONS))
+        if self._wake is not None and len(self._pool) < self.low_watermark:
+            self._wake.set()
+        return challenge
+
+    def _add(self, data) -> bool:
+        challenge = validate_challenge(data)
+        if challenge is None:
+            self.rejected += 1
+            return False
+        key = normalize_text(challenge['question'])
+        if key in self._keys or key in self._recent:
+            self.rejected += 1
+            return False
+        self._pool.append(challenge)
+        self._keys.add(key)
+        self.generated += 1
+        self._generated_at.append(time.monotonic())
+        return True
+
+    async def _refill_batch(self) -> int:
+        count = min(self.concurrency, self.max_size - len(self._pool))
+        results = await asyncio.gather(
+            *(gemini_service.fetch_challenge("预生成验证问题失败") for _ in range(count)),
+            return_exceptions=True
+        )
+        added = 0
+        for result in results:
+            if result is None or isinstance(result, Exception):
+                self.failed += 1
+            elif len(self._pool) < self.max_size and self._add(result):
+                added += 1
+        return added
+
+    async def _run(self):
+        while True:
+            if len(self._pool) < max(1, self.low_watermark):
+                while len(self._pool) < self.max_size:
+                    try:
+                        added = await self._refill_batch()
+                    except Exception as e:
+                        logging.error(f"补充验证题目池失败: {e}")
+                        added = 0
+                    if not added:
+                        break
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def refill_rate(self) -> float:
+        cutoff = time.monotonic() - RATE_WINDOW
+        while self._generated_at and self._generated_at[0] < cutoff:
+            self._generated_at.popleft()
+        return len(self._generated_at) * 60 / RATE_WINDOW
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._pool),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "generated": self.generated,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "refill_per_minute": self.refill_rate(),
+        }
+
+challenge_pool = ChallengePool(
+    config.CHALLENGE_POOL_SIZE,
+    config.CHALLENGE_POOL_LOW_WATERMARK,
+    config.CHALLENGE_POOL_REFILL_INTERVAL,
+    config.CHALLENGE_POOL_CONCURRENCY
+)
@@ -1,9 +1,14 @@
-from google.genai import Client
+from google.genai import Client, types
 from telegram import Message
 from config import config
+from services.verdict_cache import verdict_cache
+from services.image_hash import image_index
+from services.resilience import gemini_caller
+from services.settings import bot_settings
+from services.analysis_batcher import AnalysisBatcher
 import json
 import random
-import re
+from contextlib import aclosing
 from PIL import Image
 import io
 
@@ -39,6 +44,111 @@ LOCAL_VERIFICATION_QUESTIONS = [
     {"question": "以下哪个不属于数字？", "correct_answer": "字母", "incorrect_answers": ["1", "2", "3"]}
 ]
 
+CHALLENGE_PROMPT = """
+# 角色
+你是一个人机验证（CAPTCHA）问题生成器。
+# 任务
+生成一个随机的、适合成年人的中文常识性问题，用于区分人类和机器人。问题的格式应该是多样的。
+# 要求
+1.  **问题格式多样性**: 你需要随机选择以下两种问题格式之一进行提问：
+    *   **a) 标准直接提问**: 例如，"中国的首都是哪里？"
+    *   **b) 反向排除提问**: 使用"以下哪个不属于...？"或类似的句式。例如，"以下哪个不属于行星？"
+2.  **主题**: 问题主题应为完全随机的日常通用常识，无需限定在特定领域。
+3.  **难度**: 问题和选项的难度应设定为"绝大多数18岁以上母语为中文的成年人都能立即回答正确"的水平，避免专业或冷门知识。
+4.  **明确性**: 问题必须只有一个明确无误的正确答案。
+5.  **答案逻辑**:
+    *   提供一个`correct_answer`（正确答案）。
+    *   提供一个包含三个字符串的列表`incorrect_answers`（干扰项）。
+    *   **对于标准问题**，所有选项应属于同一类别。
+    *   **对于反向排除问题**，三个`incorrect_answers`应属于同一类别，而`correct_answer`则是那个不属于该类别的 outlier（局外者）。
+6.  **语言**: 所有内容必须为简体中文。
+7.  **输出格式**: 严格按照以下JSON格式返回，不要包含任何额外的解释或文字。
+# JSON格式示例
+{
+  "question": "问题文本",
+  "correct_answer": "正确答案",
+  "incorrect_answers": ["干扰项1", "干扰项2", "干扰项3"]
+}
+"""
+
+ANALYSIS_PROMPT = "\n".join([
+    "你是一个内容审查员。你的任务是分析提供给你的文本和/或图片内容，并判断其是否包含垃圾信息、恶意软件、钓鱼链接、不当言论、辱骂、攻击性词语或任何违反安全政策的内容。",
+    "请严格按照要求，仅以JSON格式返回你的分析结果，不要包含任何额外的解释或标记。",
+    "**输出格式**: 你必须且只能以严格的JSON格式返回你的分析结果，不得包含任何解释性文字或代码块标记。",
+    "**JSON结构**:\n```json\n{\n  \"is_spam\": boolean,\n  \"reason\": \"string\"\n}\n```\n*   `is_spam`: 如果内容违反**任何一条**安全策略，则为 `true`；如果内容完全安全，则为 `false`。\n*   `reason`: 用一句话精准概括判断依据。如果违规，请明确指出违规的类型。如果安全，此字段固定为 `\"内容未发现违规。\"`",
+    "\n--- 以下是需要分析的内容 ---",
+])
+
+BATCH_ANALYSIS_PROMPT = "\n".join([
+    "你是一个内容审查员。上面是一个JSON数组，每个元素包含一条待审查消息的 `id` 和 `text`。请逐条独立判断每条消息是否包含垃圾信息、恶意软件、钓鱼链接、不当言论、辱骂、攻击性词语或任何违反安全政策的内容。",
+    "**输出格式**: 你必须且只能以严格的JSON数组返回结果，不得包含任何解释性文字或代码块标记，每条输入消息对应一个元素。",
+    "**JSON结构**:\n```json\n[\n  {\"id\": integer, \"is_spam\": boolean, \"reason\": \"string\"}\n]\n```\n*   `id`: 与输入消息的 `id` 相同。\n*   `is_spam`: 如果该消息违反**任何一条**安全策略，则为 `true`；否则为 `false`。\n*   `reason`: 用一句话精准概括判断依据。如果安全，此字段固定为 `\"内容未发现违规。\"`",
+])
+
+VERDICT_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "is_spam": types.Schema(type=types.Type.BOOLEAN),
+        "reason": types.Schema(type=types.Type.STRING),
+    },
+    required=["is_spam", "reason"]
+)
+
+BATCH_VERDICT_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "id": types.Schema(type=types.Type.INTEGER),
+            "is_spam": types.Schema(type=types.Type.BOOLEAN),
+            "reason": types.Schema(type=types.Type.STRING),
+        },
+        required=["id", "is_spam", "reason"]
+    )
+)
+
+CHALLENGE_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        "question": types.Schema(type=types.Type.STRING),
+        "correct_answer": types.Schema(type=types.Type.STRING),
+        "incorrect_answers": types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(type=types.Type.STRING),
+            min_items=3,
+            max_items=3
+        ),
+    },
+    required=["question", "correct_answer", "incorrect_answers"]
+)
+
+REFUSAL_MARKERS = ("无法根据现有知识库", "抱歉")
+
+def json_output_config(schema: types.Schema) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(response_mime_type="application/json", response_schema=schema)
+
+def parse_json_response(response):
+    parsed = getattr(response, 'parsed', None)
+    if parsed is not None:
+        return parsed
+    if not response.text:
+        raise ValueError("Gemini API returned an empty response.")
+    return json.loads(response.text)
+
+def is_refusal(text: str) -> bool:
+    return any(marker in text for marker in REFUSAL_MARKERS)
+
+def build_challenge(data: dict) -> dict:
+    correct_answer = data['correct_answer']
+    options = list(data['incorrect_answers']) + [correct_answer]
+    random.shuffle(options)
+    
+    return {
+        "question": data['question'],
+        "correct_answer": correct_answer,
+        "options": options
+    }
+
 class GeminiService:
     def __init__(self):
         if config.GEMINI_API_KEY:
@@ -49,22 +159,71 @@ class GeminiService:
             self.client = None
             self.filter_model_name = None
             self.verification_model_name = None
+        self.batcher = AnalysisBatcher(
+            config.GEMINI_BATCH_ENABLED,
+            config.GEMINI_BATCH_WINDOW_MS,
+            config.GEMINI_BATCH_MAX_SIZE,
+            self._request_batch_verdicts,
+            self._request_text_verdict
+        )
     
+    def is_available(self) -> bool:
+        return self.client is not None and gemini_caller.is_available()
+
+    def is_filter_enabled(self) -> bool:
+        return self.is_available() and bool(self.filter_model_name) and bot_settings.ai_filter_enabled()
+
+    async def _generate(self, operation: str, timeout: float, **kwargs):
+        return await gemini_caller.call(
+            operation,
+            timeout,
+            lambda: self.client.aio.models.generate_content(**kwargs)
+        )
+
+    async def _remember_verdict(self, cache_key: str, image_hash: int, text_key: str, result: dict):
+        await verdict_cache.put(cache_key, result)
+        if image_hash is not None:
+            await image_index.add(image_hash, text_key, result)
+
     async def analyze_message(self, message: Message, image_bytes: bytes = None) -> dict:
-        if not self.client or not self.filter_model_name or not config.ENABLE_AI_FILTER:
+        if not self.is_filter_enabled():
             return {"is_spam": False, "reason": "AI filter disabled"}
 
-        content = []
-        prompt_parts = [
-            "你是一个内容审查员。你的任务是分析提供给你的文本和/或图片内容，并判断其是否包含垃圾信息、恶意软件、钓鱼链接、不当言论、辱骂、攻击性词语或任何违反安全政策的内容。",
-            "请严格按照要求，仅以JSON格式返回你的分析结果，不要包含任何额外的解释或标记。",
-            "**输出格式**: 你必须且只能以严格的JSON格式返回你的分析结果，不得包含任何解释性文字或代码块标记。",
-            "**JSON结构**:\n```json\n{\n  \"is_spam\": boolean,\n  \"reason\": \"string\"\n}\n```\n*   `is_spam`: 如果内容违反**任何一条**安全策略，则为 `true`；如果内容完全安全，则为 `false`。\n*   `reason`: 用一句话精准概括判断依据。如果违规，请明确指出违规的类型。如果安全，此字段固定为 `\"内容未发现违规。\"`",
-            "\n--- 以下是需要分析的内容 ---",
-        ]
+        cache_key = verdict_cache.make_key(message.text, image_bytes)
+        cached_verdict = verdict_cache.get(cache_key)
+        if cached_verdict:
+            print(f"Verdict cache hit: {cached_verdict}")
+            return cached_verdict
+
+        image_hash = None
+        text_key = None
+        if image_bytes:
+            image_hash = await image_index.compute_hash(image_bytes)
+            if image_hash is not None:
+                text_key = image_index.text_key(message.text)
+                similar_verdict = image_index.lookup(image_hash, text_key)
+                if similar_verdict:
+                    print(f"Similar image verdict hit: {similar_verdict}")
+                    await verdict_cache.put(cache_key, similar_verdict)
+                    return similar_verdict
+
+        if not image_bytes and message.text and self.batcher.enabled:
+            result = await self.batcher.submit(cache_key, message.text)
+        else:
+            content = self._build_analysis_content(message.text, image_bytes)
+            if not content:
+                return {"is_spam": False, "reason": "No content to analyze"}
+            result = await self._request_verdict(content)
 
-        if message.text:
-            content.append(message.text)
+        if result is None:
+            return {"is_spam": False, "reason": "Analysis failed"}
+        await self._remember_verdict(cache_key, image_hash, text_key, result)
+        return result
+
+    def _build_analysis_content(self, text: str, image_bytes: bytes = None) -> list:
+        content = []
+        if text:
+            content.append(text)
         
         if image_bytes:
             try:
@@ -73,18 +232,21 @@ class GeminiService:
             except Exception as e:
                 print(f"Error processing image for Gemini: {e}")
 
-        if not content:
-            return {"is_spam": False, "reason": "No content to analyze"}
-
-        content.append("\n".join(prompt_parts))
+        if content:
+            content.append(ANALYSIS_PROMPT)
+        return content
 
+    async def _request_verdict(self, content: list) -> dict:
         print("--- Sending request to Gemini API ---")
         print(f"Content: {content}")
 
         try:
-            response = await self.client.aio.models.generate_content(
+            response = await self._generate(
+                "内容审查",
+                config.GEMINI_TIMEOUT_ANALYZE,
                 model=self.filter_model_name,
-                contents=content
+                contents=content,
+                config=json_output_config(VERDICT_SCHEMA)
             )
             
             print("--- Received response from Gemini API ---")
@@ -95,18 +257,7 @@ class GeminiService:
                     print(f"Prompt feedback: {response.prompt_feedback}")
                 return {"is_spam": True, "reason": "内容审查失败，可能包含不当内容。"}
 
-            if response.candidates and response.candidates[0].content.parts:
-                response_text = response.candidates[0].content.parts[0].text
-            else:
-                response_text = None
-            
-            print(f"Raw response: {response_text}")
-
-            if not response_text:
-                raise ValueError("Gemini API returned an empty response.")
-            
-            clean_text = re.sub(r'```json\s*|\s*```', '', response_text).strip()
-            result = json.loads(clean_text)
+            result = parse_json_response(response)
             
             print(f"Parsed result: {result}")
             return result
@@ -114,172 +265,74 @@ class GeminiService:
             print(f"Gemini analysis failed: {e}")
             if 'response' in locals():
                 try:
-                    if response.candidates and response.candidates[0].content.parts:
-                        response_text = response.candidates[0].content.parts[0].text
-                        print(f"Original Gemini response: {response_text}")
-                except (AttributeError, IndexError):
+                    print(f"Original Gemini response: {response.text}")
+                except (AttributeError, IndexError, ValueError):
                     print("Could not retrieve response text.")
-            return {"is_spam": False, "reason": "Analysis failed"}
-    
-    def _get_local_question(self) -> dict:
-        question_data = random.choice(LOCAL_VERIFICATION_QUESTIONS)
-        correct_answer = question_data['correct_answer']
-        options = question_data['incorrect_answers'] + [correct_answer]
-        random.shuffle(options)
-        
-        return {
-            "question": question_data['question'],
-            "correct_answer": correct_answer,
-            "options": options
-        }
+            return None
 
-    async def generate_unblock_question(self) -> dict:
-        if not self.client or not self.verification_model_name:
-            return self._get_local_question()
-
-        prompt = """
-        # 角色
-        你是一个人机验证（CAPTCHA）问题生成器。
-        # 任务
-        生成一个随机的、适合成年人的中文常识性问题，用于区分人类和机器人。问题的格式应该是多样的。
-        # 要求
-        1.  **问题格式多样性**: 你需要随机选择以下两种问题格式之一进行提问：
-            *   **a) 标准直接提问**: 例如，"中国的首都是哪里？"
-            *   **b) 反向排除提问**: 使用"以下哪个不属于...？"或类似的句式。例如，"以下哪个不属于行星？"
-        2.  **主题**: 问题主题应为完全随机的日常通用常识，无需限定在特定领域。
-        3.  **难度**: 问题和选项的难度应设定为"绝大多数18岁以上母语为中文的成年人都能立即回答正确"的水平，避免专业或冷门知识。
-        4.  **明确性**: 问题必须只有一个明确无误的正确答案。
-        5.  **答案逻辑**:
-            *   提供一个`correct_answer`（正确答案）。
-            *   提供一个包含三个字符串的列表`incorrect_answers`（干扰项）。
-            *   **对于标准问题**，所有选项应属于同一类别。
-            *   **对于反向排除问题**，三个`incorrect_answers`应属于同一类别，而`correct_answer`则是那个不属于该类别的 outlier（局外者）。
-        6.  **语言**: 所有内容必须为简体中文。
-        7.  **输出格式**: 严格按照以下JSON格式返回，不要包含任何额外的解释或文字。
-        # JSON格式示例
-        {
-          "question": "问题文本",
-          "correct_answer": "正确答案",
-          "incorrect_answers": ["干扰项1", "干扰项2", "干扰项3"]
-        }
-        """
+    async def _request_text_verdict(self, text: str) -> dict:
+        return await self._request_verdict(self._build_analysis_content(text))
+
+    async def _request_batch_verdicts(self, texts: list) -> list:
+        items = json.dumps([{"id": i, "text": text} for i, text in enumerate(texts)], ensure_ascii=False)
+        print(f"--- Sending batch of {len(texts)} messages to Gemini API ---")
+
+        response = await self._generate(
+            "批量审查",
+            config.GEMINI_TIMEOUT_ANALYZE,
+            model=self.filter_model_name,
+            contents=[items, BATCH_ANALYSIS_PROMPT],
+            config=json_output_config(BATCH_VERDICT_SCHEMA)
+        )
+
+        verdicts = [None] * len(texts)
         try:
-            response = await self.client.aio.models.generate_content(
-                model=self.verification_model_name,
-                contents=prompt
-            )
-            
-            if response.candidates and response.candidates[0].content.parts:
-                response_text = response.candidates[0].content.parts[0].text
-            else:
-                response_text = None
-            
-            if not response_text:
-                raise ValueError("Gemini API返回空响应")
-            
-            clean_text = re.sub(r'```json\s*|\s*```', '', response_text).strip()
-            data = json.loads(clean_text)
-            
-            correct_answer = data['correct_answer']
-            options = data['incorrect_answers'] + [correct_answer]
-            random.shuffle(options)
-            
-            return {
-                "question": data['question'],
-                "correct_answer": correct_answer,
-                "options": options
-            }
+            results = parse_json_response(response)
         except Exception as e:
-            print(f"生成解封验证问题失败: {e}")
-            
-            if 'response' in locals():
-                try:
-                    if response.candidates and response.candidates[0].content.parts:
-                        response_text = response.candidates[0].content.parts[0].text
-                        if response_text:
-                            print(f"Gemini原始响应: {response_text}")
-                except (AttributeError, IndexError):
-                    pass
-            
-            return self._get_local_question()
+            print(f"Gemini batch analysis returned an unusable response: {e}")
+            return verdicts
 
-    async def generate_verification_challenge(self) -> dict:
+        for item in results if isinstance(results, list) else []:
+            if not isinstance(item, dict) or not isinstance(item.get("is_spam"), bool):
+                continue
+            index = item.get("id")
+            if isinstance(index, int) and 0 <= index < len(texts):
+                verdicts[index] = {"is_spam": item["is_spam"], "reason": item.get("reason") or "未提供原因"}
+        return verdicts
+    
+    async def fetch_challenge(self, error_label: str = "生成验证问题失败") -> dict:
         if not self.client or not self.verification_model_name:
-            return self._get_local_question()
-
-        prompt = """
-        # 角色
-        你是一个人机验证（CAPTCHA）问题生成器。
-        # 任务
-        生成一个随机的、适合成年人的中文常识性问题，用于区分人类和机器人。问题的格式应该是多样的。
-        # 要求
-        1.  **问题格式多样性**: 你需要随机选择以下两种问题格式之一进行提问：
-            *   **a) 标准直接提问**: 例如，"中国的首都是哪里？"
-            *   **b) 反向排除提问**: 使用"以下哪个不属于...？"或类似的句式。例如，"以下哪个不属于行星？"
-        2.  **主题**: 问题主题应为完全随机的日常通用常识，无需限定在特定领域。
-        3.  **难度**: 问题和选项的难度应设定为"绝大多数18岁以上母语为中文的成年人都能立即回答正确"的水平，避免专业或冷门知识。
-        4.  **明确性**: 问题必须只有一个明确无误的正确答案。
-        5.  **答案逻辑**:
-            *   提供一个`correct_answer`（正确答案）。
-            *   提供一个包含三个字符串的列表`incorrect_answers`（干扰项）。
-            *   **对于标准问题**，所有选项应属于同一类别。
-            *   **对于反向排除问题**，三个`incorrect_answers`应属于同一类别，而`correct_answer`则是那个不属于该类别的 outlier（局外者）。
-        6.  **语言**: 所有内容必须为简体中文。
-        7.  **输出格式**: 严格按照以下JSON格式返回，不要包含任何额外的解释或文字。
-        # JSON格式示例
-        {
-          "question": "问题文本",
-          "correct_answer": "正确答案",
-          "incorrect_answers": ["干扰项1", "干扰项2", "干扰项3"]
-        }
-        """
+            return None
+
         try:
-            response = await self.client.aio.models.generate_content(
+            response = await self._generate(
+                "验证题生成",
+                config.GEMINI_TIMEOUT_CHALLENGE,
                 model=self.verification_model_name,
-                contents=prompt
+                contents=CHALLENGE_PROMPT,
+                config=json_output_config(CHALLENGE_SCHEMA)
             )
             
-            if response.candidates and response.candidates[0].content.parts:
-                response_text = response.candidates[0].content.parts[0].text
-            else:
-                response_text = None
-            
-            if not response_text:
-                raise ValueError("Gemini API返回空响应")
-
-            clean_text = re.sub(r'```json\s*|\s*```', '', response_text).strip()
-            data = json.loads(clean_text)
-            
-            correct_answer = data['correct_answer']
-            options = data['incorrect_answers'] + [correct_answer]
-            random.shuffle(options)
+            data = parse_json_response(response)
             
             return {
                 "question": data['question'],
-                "correct_answer": correct_answer,
-                "options": options
+                "correct_answer": data['correct_answer'],
+                "incorrect_answers": data['incorrect_answers']
             }
         except Exception as e:
-            print(f"生成验证问题失败: {e}")
+            print(f"{error_label}: {e}")
             
             if 'response' in locals():
                 try:
-                    if response.candidates and response.candidates[0].content.parts:
-                        response_text = response.candidates[0].content.parts[0].text
-                        if response_text:
-                            print(f"Gemini原始响应: {response_text}")
-                except (AttributeError, IndexError):
+                    if response.text:
+                        print(f"Gemini原始响应: {response.text}")
+                except (AttributeError, IndexError, ValueError):
                     pass
             
-            return self._get_local_question()
-
-    async def generate_autoreply(self, user_message: str, knowledge_base_content: str) -> str:
-        if not self.client or not self.filter_model_name:
-            return None
-
-        if not knowledge_base_content or knowledge_base_content.strip() == "":
             return None
 
+    def _build_autoreply_prompt(self, user_message: str, knowledge_base_content: str) -> str:
         prompt_parts = [
             "你是一个客服助手，必须严格根据提供的知识库内容来回答用户的问题。",
             "**重要规则：**",
@@ -301,11 +354,21 @@ class GeminiService:
             "\n--- 请根据知识库内容回答用户问题（使用Markdown格式）---",
             "如果知识库中没有相关内容，请回复：'抱歉，我无法根据现有知识库回答您的问题，请稍后管理员会为您回复。'"
         ]
+        return "\n".join(prompt_parts)
+
+    async def generate_autoreply(self, user_message: str, knowledge_base_content: str) -> str:
+        if not self.client or not self.filter_model_name:
+            return None
+
+        if not knowledge_base_content or knowledge_base_content.strip() == "":
+            return None
 
         try:
-            response = await self.client.aio.models.generate_content(
+            response = await self._generate(
+                "自动回复",
+                config.GEMINI_TIMEOUT_AUTOREPLY,
                 model=self.filter_model_name,
-                contents="\n".join(prompt_parts)
+                contents=self._build_autoreply_prompt(user_message, knowledge_base_content)
             )
             
             if not hasattr(response, 'candidates') or not response.candidates:
@@ -320,7 +383,7 @@ class GeminiService:
             if not response_text:
                 return None
             
-            if "无法根据现有知识库" in response_text or "抱歉" in response_text:
+            if is_refusal(response_text):
                 return None
             
             return response_text.strip()
@@ -328,4 +391,25 @@ class GeminiService:
             print(f"Gemini自动回复生成失败: {e}")
             return None
 
+    async def stream_autoreply(self, user_message: str, knowledge_base_content: str):
+        if not self.client or not self.filter_model_name or not knowledge_base_content.strip():
+            return
+
+        stream = gemini_caller.stream(
+            "自动回复",
+            config.GEMINI_TIMEOUT_AUTOREPLY,
+            lambda: self.client.aio.models.generate_content_stream(
+                model=self.filter_model_name,
+                contents=self._build_autoreply_prompt(user_message, knowledge_base_content)
+            )
+        )
+        async with aclosing(stream):
+            async for chunk in stream:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    text = None
+                if text:
+                    yield text
+
 gemini_service = GeminiService()
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import io
+from collections import OrderedDict
+from itertools import combinations
+from PIL import Image
+from config import config
+from database import models as db
+from services.verdict_cache import normalize_text
+
+HASH_BITS = 64
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    with Image.open(io.BytesIO(bytes(image_bytes))) as img:
+        img = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(img.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def to_signed(value: int) -> int:
+    return value - (1 << HASH_BITS) if value >= (1 << (HASH_BITS - 1)) else value
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+class MultiIndexHashTable:
+    def __init__(self, max_distance: int, chunks: int = 4):
+        self.max_distance = max_distance
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self._chunk_mask = (1 << self.chunk_bits) - 1
+        self._tables = [{} for _ in range(chunks)]
+        self._payloads = {}
+        self._variants = [0]
+        for bit_count in range(1, max_distance // chunks + 1):
+            self._variants.extend(
+                sum(1 << bit for bit in bits)
+                for bits in combinations(range(self.chunk_bits), bit_count)
+            )
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def _split(self, value: int):
+        return [(value >> (i * self.chunk_bits)) & self._chunk_mask for i in range(self.chunks)]
+
+    def add(self, value: int, key, payload):
+        entry = self._payloads.get(value)
+        if entry is None:
+            entry = self._payloads[value] = {}
+            for table, chunk in zip(self._tables, self._split(value)):
+                table.setdefault(chunk, set()).add(value)
+        entry[key] = payload
+
+    def remove(self, value: int, key):
+        entry = self._payloads.get(value)
+        if entry is None:
+            return
+        entry.pop(key, None)
+        if entry:
+            return
+        del self._payloads[value]
+        for table, chunk in zip(self._tables, self._split(value)):
+            bucket = table.get(chunk)
+            if bucket is not None:
+                bucket.discard(value)
+                if not bucket:
+                    del table[chunk]
+
+    def search(self, value: int):
+        candidates = set()
+        for table, chunk in zip(self._tables, self._split(value)):
+            for variant in self._variants:
+                bucket = table.get(chunk ^ variant)
+                if bucket:
+                    candidates.update(bucket)
+        results = []
+        for candidate in candidates:
+            distance = hamming_distance(value, candidate)
+            if distance <= self.max_distance:
+                results.append((distance, self._payloads[candidate]))
+        results.sort(key=lambda item: item[0])
+        return results
+
+class ImageVerdictIndex:
+    def __init__(self, max_distance: int, max_size: int):
+        self.max_size = max(1, max_size)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._table = MultiIndexHashTable(max(0, min(max_distance, HASH_BITS)))
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+    async def compute_hash(self, image_bytes: bytes):
+        try:
+            return await asyncio.to_thread(dhash, image_bytes)
+        except Exception as e:
+            print(f"计算图片感知哈希失败: {e}")
+            return None
+
+    def lookup(self, image_hash: int, text_key: str):
+        for _, payloads in self._table.search(image_hash):
+            verdict = payloads.get(text_key)
+            if verdict:
+                self.hits += 1
+                return dict(verdict)
+        self.misses += 1
+        return None
+
+    def _insert(self, image_hash: int, text_key: str, verdict: dict):
+        self._entries[(image_hash, text_key)] = True
+        self._entries.move_to_end((image_hash, text_key))
+        self._table.add(image_hash, text_key, verdict)
+        while len(self._entries) > self.max_size:
+            old_hash, old_key = self._entries.popitem(last=False)[0]
+            self._table.remove(old_hash, old_key)
+
+    async def add(self, image_hash: int, text_key: str, verdict: dict):
+        entry = {"is_spam": bool(verdict.get("is_spam")), "reason": verdict.get("reason")}
+        self._insert(image_hash, text_key, entry)
+        await db.save_image_hash(to_signed(image_hash), text_key, entry["is_spam"], entry["reason"])
+
+    async def load(self) -> int:
+        rows = await db.load_image_hashes(self.max_size)
+        for image_hash, text_key, is_spam, reason in reversed(rows):
+            self._insert(to_unsigned(image_hash), text_key, {"is_spam": bool(is_spam), "reason": reason})
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+image_index = ImageVerdictIndex(config.IMAGE_HASH_MAX_DISTANCE, config.IMAGE_HASH_INDEX_SIZE)
@@ -0,0 +1,88 @@
+import time
+from collections import deque
+from telegram import Update
+from config import config
+from utils.lru_cache import TTLCache
+
+DEFAULT_QUEUE_MAX_SIZE = 1000
+BUSY_MESSAGE = "当前消息较多，系统繁忙，请稍后再发送。"
+
+class IngressTicket:
+    __slots__ = ("enqueued_at", "rejected")
+
+    def __init__(self, enqueued_at: float, rejected: bool = False):
+        self.enqueued_at = enqueued_at
+        self.rejected = rejected
+
+class IngressQueue:
+    def __init__(self, max_size: int, pressure_ratio: float = 0.8):
+        self.max_size = max(1, max_size)
+        self.pressure_ratio = pressure_ratio
+        self.depth = 0
+        self.peak_depth = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.shed = 0
+        self._wait_times = deque(maxlen=1000)
+        self._notified_users = TTLCache(10000, 60)
+
+    def set_max_size(self, max_size: int):
+        self.max_size = max(1, max_size)
+
+    def is_tracked(self, update: object) -> bool:
+        if not isinstance(update, Update) or not update.message:
+            return False
+        chat = update.effective_chat
+        user = update.effective_user
+        return chat is not None and chat.type == "private" and user is not None and user.id not in config.ADMIN_IDS
+
+    def enter(self, update: object):
+        if not self.is_tracked(update):
+            return None
+        if self.depth >= self.max_size:
+            self.rejected += 1
+            return IngressTicket(time.monotonic(), rejected=True)
+        self.depth += 1
+        self.admitted += 1
+        self.peak_depth = max(self.peak_depth, self.depth)
+        return IngressTicket(time.monotonic())
+
+    def mark_started(self, ticket: IngressTicket):
+        self._wait_times.append(time.monotonic() - ticket.enqueued_at)
+
+    def leave(self, ticket: IngressTicket):
+        self.depth = max(0, self.depth - 1)
+
+    async def reject(self, update: Update):
+        user_id = update.effective_user.id
+        if user_id in self._notified_users:
+            return
+        self._notified_users.set(user_id, True)
+        try:
+            await update.message.reply_text(BUSY_MESSAGE)
+        except Exception as e:
+            print(f"发送繁忙提示失败: {e}")
+
+    def is_under_pressure(self) -> bool:
+        return self.depth >= max(1, int(self.max_size * self.pressure_ratio))
+
+    def allow_low_priority(self) -> bool:
+        if self.is_under_pressure():
+            self.shed += 1
+            return False
+        return True
+
+    def stats(self) -> dict:
+        waits = sorted(self._wait_times)
+        return {
+            "depth": self.depth,
+            "max_size": self.max_size,
+            "peak_depth": self.peak_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "shed": self.shed,
+            "avg_wait_ms": sum(waits) / len(waits) * 1000 if waits else 0.0,
+            "p95_wait_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0,
+        }
+
+ingress_queue = IngressQueue(DEFAULT_QUEUE_MAX_SIZE)
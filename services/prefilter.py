@@ -0,0 +1,271 @@
+import logging
+import re
+import unicodedata
+from collections import deque
+from telegram import Message, MessageEntity
+from config import config
+from database import models as db
+from services.verdict_cache import normalize_text, ZERO_WIDTH_PATTERN
+from services.settings import bot_settings
+from utils.lru_cache import TTLCache
+
+RULE_TYPES = {
+    "domain": "域名",
+    "keyword": "关键词",
+    "regex": "正则",
+}
+REPEAT_TRACK_SIZE = 20000
+
+URL_HOST_PATTERN = re.compile(r'(?:https?://|tg://|www\.)([^\s/:?#]+)', re.IGNORECASE)
+BARE_DOMAIN_PATTERN = re.compile(r'(?<![\w@.-])((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,24})(?![\w-])', re.IGNORECASE)
+STYLED_CHAR_PATTERN = re.compile(r'[\U0001D400-\U0001D7FF\u24b6-\u24e9\U0001F130-\U0001F189]')
+DIGIT_RUN_PATTERN = re.compile(r'\d{7,}')
+MENTION_PATTERN = re.compile(r'@[a-z0-9_]{4,}', re.IGNORECASE)
+
+class KeywordAutomaton:
+    def __init__(self, keywords=()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [None]
+        self.size = 0
+        for keyword in keywords:
+            self._insert(keyword)
+        self._build()
+
+    def _insert(self, keyword: str):
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            state = next_state
+        if self._output[state] is None:
+            self.size += 1
+        self._output[state] = keyword
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                if self._output[next_state] is None:
+                    self._output[next_state] = self._output[self._fail[next_state]]
+
+    def search(self, text: str):
+        if not self.size or not text:
+            return None
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state] is not None:
+                return self._output[state]
+        return None
+
+class SpamPrefilter:
+    def __init__(self, safe_max_length: int, repeat_window: int, repeat_users: int,
+                 repeat_min_length: int, styled_ratio: float):
+        self.safe_max_length = safe_max_length
+        self.repeat_users = max(2, repeat_users)
+        self.repeat_min_length = repeat_min_length
+        self.styled_ratio = styled_ratio
+        self.rules = []
+        self.checked = 0
+        self.local_spam = 0
+        self.local_ham = 0
+        self.escalated = 0
+        self._domains = set()
+        self._keywords = KeywordAutomaton()
+        self._regexes = []
+        self._repeats = TTLCache(REPEAT_TRACK_SIZE, repeat_window)
+
+    @staticmethod
+    def normalize_pattern(rule_type: str, pattern: str) -> str:
+        pattern = (pattern or "").strip()
+        if rule_type == "domain":
+            pattern = re.sub(r'^[a-z]+://', '', pattern.lower()).split('/')[0]
+            if pattern.startswith('www.'):
+                pattern = pattern[4:]
+            return pattern.strip('.')
+        if rule_type == "keyword":
+            return normalize_text(pattern)
+        return pattern
+
+    def _compile(self, rules):
+        domains = set()
+        keywords = []
+        regexes = []
+        for rule in rules:
+            if rule['rule_type'] == "domain":
+                domains.add(rule['pattern'])
+            elif rule['rule_type'] == "keyword":
+                keywords.append(rule['pattern'])
+            elif rule['rule_type'] == "regex":
+                try:
+                    regexes.append((rule['pattern'], re.compile(rule['pattern'], re.IGNORECASE)))
+                except re.error as e:
+                    logging.warning(f"忽略无效的预过滤正则 {rule['pattern']!r}: {e}")
+        self.rules = rules
+        self._domains = domains
+        self._keywords = KeywordAutomaton(keywords)
+        self._regexes = regexes
+
+    @property
+    def enabled(self) -> bool:
+        return bot_settings.get('prefilter_enabled')
+
+    @property
+    def fast_accept(self) -> bool:
+        return bot_settings.get('prefilter_fast_accept')
+
+    async def load(self) -> int:
+        self._compile(await db.get_prefilter_rules())
+        return len(self.rules)
+
+    async def add_rule(self, rule_type: str, pattern: str, created_by: int):
+        if rule_type not in RULE_TYPES:
+            return False, f"未知的规则类型: {rule_type}"
+        pattern = self.normalize_pattern(rule_type, pattern)
+        if not pattern:
+            return False, "规则内容不能为空。"
+        if rule_type == "regex":
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                return False, f"正则表达式无效: {e}"
+        if not await db.add_prefilter_rule(rule_type, pattern, created_by):
+            return False, "该规则已存在。"
+        self._compile(await db.get_prefilter_rules())
+        return True, f"已添加{RULE_TYPES[rule_type]}规则: {pattern}"
+
+    async def remove_rule(self, rule_id: int) -> bool:
+        removed = await db.remove_prefilter_rule(rule_id)
+        if removed:
+            self._compile(await db.get_prefilter_rules())
+        return removed
+
+    async def set_enabled(self, enabled: bool):
+        await bot_settings.set('prefilter_enabled', enabled)
+
+    async def set_fast_accept(self, enabled: bool):
+        await bot_settings.set('prefilter_fast_accept', enabled)
+
+    @staticmethod
+    def extract_hosts(message: Message, text: str) -> set:
+        hosts = set()
+        entities = message.entities or message.caption_entities or ()
+        for entity in entities:
+            if entity.type == MessageEntity.TEXT_LINK and entity.url:
+                hosts.update(URL_HOST_PATTERN.findall(entity.url))
+        hosts.update(URL_HOST_PATTERN.findall(text))
+        hosts.update(BARE_DOMAIN_PATTERN.findall(text))
+        return {host.lower().rstrip('.') for host in hosts}
+
+    def _match_domain(self, hosts: set):
+        for host in hosts:
+            labels = host.split('.')
+            for i in range(len(labels) - 1):
+                candidate = '.'.join(labels[i:])
+                if candidate in self._domains:
+                    return candidate
+        return None
+
+    def _check_repeat(self, user_id: int, normalized: str) -> bool:
+        if len(normalized) < self.repeat_min_length:
+            return False
+        senders = self._repeats.get(normalized, count=False)
+        if senders is None:
+            senders = set()
+        senders.add(user_id)
+        self._repeats.set(normalized, senders)
+        return len(senders) >= self.repeat_users
+
+    def _is_styled(self, raw_text: str) -> bool:
+        visible = sum(1 for char in raw_text if not char.isspace())
+        styled = len(STYLED_CHAR_PATTERN.findall(raw_text))
+        return styled >= 3 and visible and styled / visible >= self.styled_ratio
+
+    def _classify(self, message: Message, user_id: int, image_bytes: bytes = None):
+        raw_text = message.text or message.caption or ""
+        text = unicodedata.normalize('NFKC', raw_text)
+        normalized = normalize_text(raw_text)
+        hosts = self.extract_hosts(message, text)
+
+        blocked_domain = self._match_domain(hosts)
+        if blocked_domain:
+            return {"is_spam": True, "reason": f"包含被屏蔽的域名：{blocked_domain}"}
+
+        keyword = self._keywords.search(normalized)
+        if keyword:
+            return {"is_spam": True, "reason": f"包含被屏蔽的关键词：{keyword}"}
+
+        for _, regex in self._regexes:
+            if regex.search(text):
+                return {"is_spam": True, "reason": "匹配到本地过滤规则。"}
+
+        if self._is_styled(raw_text):
+            return {"is_spam": True, "reason": "大量使用变体字符规避审查。"}
+
+        repeated = self._check_repeat(user_id, normalized)
+
+        if image_bytes:
+            return None
+        if not normalized:
+            return {"is_spam": False, "reason": "无可审查的文本内容。"}
+
+        suspicious = (
+            repeated
+            or hosts
+            or ZERO_WIDTH_PATTERN.search(raw_text)
+            or DIGIT_RUN_PATTERN.search(text)
+            or MENTION_PATTERN.search(text)
+        )
+        if self.fast_accept and not suspicious and len(normalized) <= self.safe_max_length:
+            return {"is_spam": False, "reason": "本地预过滤判定为正常内容。"}
+        return None
+
+    def check(self, message: Message, user_id: int, image_bytes: bytes = None):
+        if not self.enabled:
+            return None
+        self.checked += 1
+        result = self._classify(message, user_id, image_bytes)
+        if result is None:
+            self.escalated += 1
+        elif result["is_spam"]:
+            self.local_spam += 1
+        else:
+            self.local_ham += 1
+        return result
+
+    def stats(self) -> dict:
+        resolved = self.local_spam + self.local_ham
+        return {
+            "enabled": self.enabled,
+            "fast_accept": self.fast_accept,
+            "rules": len(self.rules),
+            "checked": self.checked,
+            "local_spam": self.local_spam,
+            "local_ham": self.local_ham,
+            "escalated": self.escalated,
+            "resolved_rate": resolved / self.checked if self.checked else 0.0,
+        }
+
+spam_prefilter = SpamPrefilter(
+    config.PREFILTER_SAFE_MAX_LENGTH,
+    config.PREFILTER_REPEAT_WINDOW,
+    config.PREFILTER_REPEAT_USERS,
+    config.PREFILTER_REPEAT_MIN_LENGTH,
+    config.PREFILTER_STYLED_RATIO
+)
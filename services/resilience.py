@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from config import config
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+STATE_NAMES = {
+    STATE_CLOSED: "关闭（正常）",
+    STATE_OPEN: "打开（已熔断）",
+    STATE_HALF_OPEN: "半开（探测中）",
+}
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = max(0, recovery_timeout)
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def _refresh(self):
+        if self.state == STATE_OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self.state = STATE_HALF_OPEN
+            self._probes = 0
+            logging.info(f"{self.name} 熔断器进入半开状态，开始探测。")
+
+    def is_available(self) -> bool:
+        self._refresh()
+        if self.state == STATE_HALF_OPEN:
+            return self._probes < self.half_open_max_calls
+        return self.state == STATE_CLOSED
+
+    def allow(self) -> bool:
+        self._refresh()
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def release_probe(self):
+        if self.state == STATE_HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record_success(self):
+        if self.state != STATE_CLOSED:
+            logging.info(f"{self.name} 探测成功，熔断器已恢复。")
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == STATE_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != STATE_OPEN:
+                self.trips += 1
+                logging.warning(f"{self.name} 连续失败 {self.consecutive_failures} 次，熔断器已打开。")
+            self.state = STATE_OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        self._refresh()
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+class LatencyTracker:
+    def __init__(self, max_samples: int = 1000):
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self._samples = deque(maxlen=max_samples)
+
+    def record(self, elapsed_ms: float):
+        self._samples.append(elapsed_ms)
+
+    def percentile(self, percent: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent))]
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+        }
+
+class ResilientCaller:
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self._trackers = {}
+
+    def tracker(self, operation: str) -> LatencyTracker:
+        tracker = self._trackers.get(operation)
+        if tracker is None:
+            tracker = self._trackers[operation] = LatencyTracker()
+        return tracker
+
+    def is_available(self) -> bool:
+        return self.breaker.is_available()
+
+    async def call(self, operation: str, timeout: float, factory):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.breaker.name} 熔断器已打开，跳过调用")
+        tracker = self.tracker(operation)
+        tracker.calls += 1
+        started = time.monotonic()
+        finished = False
+        failed = False
+        try:
+            result = await asyncio.wait_for(factory(), timeout)
+            finished = True
+        except asyncio.TimeoutError:
+            failed = True
+            tracker.timeouts += 1
+            tracker.failures += 1
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            failed = True
+            tracker.failures += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            if not finished and not failed:
+                self.breaker.release_probe()
+        tracker.record((time.monotonic() - started) * 1000)
+        self.breaker.record_success()
+        return result
+
+    async def stream(self, operation: str, timeout: float, factory):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.breaker.name} 熔断器已打开，跳过调用")
+        tracker = self.tracker(operation)
+        tracker.calls += 1
+        started = time.monotonic()
+        deadline = started + timeout
+        iterator = None
+        finished = False
+        failed = False
+        try:
+            iterator = await asyncio.wait_for(factory(), timeout)
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), max(0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    break
+                yield chunk
+            finished = True
+        except asyncio.TimeoutError:
+            failed = True
+            tracker.timeouts += 1
+            tracker.failures += 1
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            failed = True
+            tracker.failures += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            if not finished and not failed:
+                self.breaker.release_probe()
+            if iterator is not None and hasattr(iterator, "aclose"):
+                try:
+                    await iterator.aclose()
+                except Exception as e:
+                    logging.debug(f"关闭 {operation} 响应流失败: {e}")
+        tracker.record((time.monotonic() - started) * 1000)
+        self.breaker.record_success()
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.stats(),
+            "operations": {operation: tracker.stats() for operation, tracker in self._trackers.items()},
+        }
+
+gemini_caller = ResilientCaller(
+    CircuitBreaker("Gemini", config.GEMINI_BREAKER_THRESHOLD, config.GEMINI_BREAKER_RECOVERY)
+)
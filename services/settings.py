@@ -0,0 +1,83 @@
+import logging
+from config import config
+from database import models as db
+
+SETTING_DEFAULTS = {
+    'autoreply_enabled': False,
+    'verification_enabled': True,
+    'ai_filter_enabled': True,
+    'max_message_length': 4096,
+    'queue_max_size': 1000,
+    'prefilter_enabled': True,
+    'prefilter_fast_accept': False,
+}
+SETTING_NAMES = {
+    'autoreply_enabled': "自动回复",
+    'verification_enabled': "人机验证",
+    'ai_filter_enabled': "AI 内容审查",
+    'max_message_length': "最大消息长度",
+    'queue_max_size': "消息队列容量",
+    'prefilter_enabled': "本地预过滤",
+    'prefilter_fast_accept': "简短文本直接放行",
+}
+
+class SettingsService:
+    def __init__(self):
+        self.loaded = False
+        self._values = {}
+        self._listeners = {}
+
+    async def load(self) -> int:
+        self._values = await db.get_all_settings()
+        self.loaded = True
+        for key, listeners in self._listeners.items():
+            for listener in listeners:
+                listener(self.get(key))
+        return len(self._values)
+
+    def on_change(self, key: str, listener):
+        self._listeners.setdefault(key, []).append(listener)
+
+    def get(self, key: str):
+        default = SETTING_DEFAULTS.get(key)
+        raw = self._values.get(key)
+        if raw is None:
+            return default
+        if isinstance(default, bool):
+            return raw == '1'
+        if isinstance(default, int):
+            try:
+                return int(raw)
+            except ValueError:
+                logging.warning(f"设置项 {key} 的值 {raw!r} 无效，使用默认值 {default}。")
+                return default
+        return raw
+
+    async def set(self, key: str, value):
+        raw = ('1' if value else '0') if isinstance(value, bool) else str(value)
+        await db.set_setting(key, raw)
+        self._values[key] = raw
+        for listener in self._listeners.get(key, ()):
+            listener(self.get(key))
+
+    async def toggle(self, key: str) -> bool:
+        value = not self.get(key)
+        await self.set(key, value)
+        return value
+
+    def autoreply_enabled(self) -> bool:
+        return self.get('autoreply_enabled')
+
+    def verification_enabled(self) -> bool:
+        return config.VERIFICATION_ENABLED and self.get('verification_enabled')
+
+    def ai_filter_enabled(self) -> bool:
+        return config.ENABLE_AI_FILTER and self.get('ai_filter_enabled')
+
+    def max_message_length(self) -> int:
+        return self.get('max_message_length')
+
+    def queue_max_size(self) -> int:
+        return self.get('queue_max_size')
+
+bot_settings = SettingsService()
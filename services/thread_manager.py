@@ -1,3 +1,4 @@
+import asyncio
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.helpers import escape_markdown
@@ -6,13 +7,33 @@ from config import config
 from datetime import datetime
 from utils.message_sender import send_message_by_type
 
+pending_topic_creations: dict[int, asyncio.Task] = {}
+
 async def get_or_create_thread(update: Update, context: ContextTypes.DEFAULT_TYPE) -> tuple[int, bool]:
     user = update.effective_user
+    
+    pending = pending_topic_creations.get(user.id)
+    if pending:
+        thread_id, _ = await asyncio.shield(pending)
+        return thread_id, False
+    
     user_data = await db.get_user(user.id)
     
     if user_data and user_data.get('thread_id'):
         return user_data['thread_id'], False
     
+    pending = pending_topic_creations.get(user.id)
+    if pending:
+        thread_id, _ = await asyncio.shield(pending)
+        return thread_id, False
+    
+    task = asyncio.create_task(_create_thread(update, context))
+    pending_topic_creations[user.id] = task
+    task.add_done_callback(lambda _: pending_topic_creations.pop(user.id, None))
+    return await asyncio.shield(task)
+
+async def _create_thread(update: Update, context: ContextTypes.DEFAULT_TYPE) -> tuple[int, bool]:
+    user = update.effective_user
     topic_name = f"{user.first_name} (ID: {user.id})"
     try:
         topic = await context.bot.create_forum_topic(
@@ -0,0 +1,51 @@
+import hashlib
+import re
+import unicodedata
+from config import config
+from database import models as db
+from utils.lru_cache import TTLCache
+
+ZERO_WIDTH_PATTERN = re.compile(r'[\u200b-\u200f\u2060\ufeff]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def normalize_text(text: str) -> str:
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFKC', text)
+    text = ZERO_WIDTH_PATTERN.sub('', text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip().casefold()
+
+class VerdictCache:
+    def __init__(self, max_size: int, ttl: int, persist: bool):
+        self.ttl = ttl
+        self.persist = persist
+        self._cache = TTLCache(max_size, ttl)
+
+    @staticmethod
+    def make_key(text: str = None, image_bytes: bytes = None) -> str:
+        image_digest = hashlib.sha256(bytes(image_bytes)).hexdigest() if image_bytes else ""
+        return hashlib.sha256(f"{normalize_text(text)}\x00{image_digest}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        verdict = self._cache.get(key)
+        return dict(verdict) if verdict else None
+
+    async def put(self, key: str, verdict: dict):
+        entry = {"is_spam": bool(verdict.get("is_spam")), "reason": verdict.get("reason")}
+        self._cache.set(key, entry)
+        if self.persist:
+            await db.save_verdict(key, entry["is_spam"], entry["reason"])
+
+    async def load(self) -> int:
+        if not self.persist:
+            return 0
+        rows = await db.load_verdicts(self.ttl, self._cache.max_size)
+        for key, is_spam, reason, age in reversed(rows):
+            ttl = max(1, self.ttl - age) if self.ttl > 0 else None
+            self._cache.set(key, {"is_spam": bool(is_spam), "reason": reason}, ttl=ttl)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+verdict_cache = VerdictCache(config.VERDICT_CACHE_SIZE, config.VERDICT_CACHE_TTL, config.VERDICT_CACHE_PERSIST)
@@ -2,12 +2,12 @@ import time
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from database import models as db
 from config import config
-from services.gemini_service import gemini_service
+from services.challenge_pool import challenge_pool
 
 pending_verifications = {}
 
 async def create_verification(user_id: int):
-    challenge = await gemini_service.generate_verification_challenge()
+    challenge = challenge_pool.pop()
     question = challenge['question']
     correct_answer = challenge['correct_answer']
     options = challenge['options']
@@ -55,7 +55,7 @@ async def verify_answer(user_id: int, answer: str):
         )
         return False, message, True, None
     
-    challenge = await gemini_service.generate_verification_challenge()
+    challenge = challenge_pool.pop()
     new_question = challenge['question']
     new_correct_answer = challenge['correct_answer']
     new_options = challenge['options']
@@ -2,14 +2,28 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from config import config
 
-async def send_message_by_type(bot, message, chat_id, thread_id=None, disable_web_page_preview=False):
+def get_media_info(message):
+    if message.photo:
+        return "photo", message.photo[-1].file_id
+    for media_type in ("animation", "video", "document", "audio", "voice", "video_note", "sticker"):
+        media = getattr(message, media_type)
+        if media:
+            return media_type, media.file_id
+    return None, None
+
+async def send_message_by_type(bot, message, chat_id, thread_id=None, disable_web_page_preview=False, reply_to_message_id=None):
+    reply_kwargs = {}
+    if reply_to_message_id:
+        reply_kwargs = {"reply_to_message_id": reply_to_message_id, "allow_sending_without_reply": True}
+
     if message.text:
         return await bot.send_message(
             chat_id=chat_id,
             text=message.text,
             entities=message.entities,
             message_thread_id=thread_id,
-            disable_web_page_preview=disable_web_page_preview
+            disable_web_page_preview=disable_web_page_preview,
+            **reply_kwargs
         )
     elif message.photo:
         return await bot.send_photo(
@@ -17,7 +31,8 @@ async def send_message_by_type(bot, message, chat_id, thread_id=None, disable_we
             photo=message.photo[-1].file_id,
             caption=message.caption,
             caption_entities=message.caption_entities,
-            message_thread_id=thread_id
+            message_thread_id=thread_id,
+            **reply_kwargs
         )
     elif message.animation:
         return await bot.send_animation(
@@ -25,7 +40,8 @@ async def send_message_by_type(bot, message, chat_id, thread_id=None, disable_we
             animation=message.animation.file_id,
             caption=message.caption,
             caption_entities=message.caption_entities,
-            message_thread_id=thread_id
+            message_thread_id=thread_id,
+            **reply_kwargs
         )
     elif message.video:
         return await bot.send_video(
@@ -33,7 +49,8 @@ async def send_message_by_type(bot, message, chat_id, thread_id=None, disable_we
             video=message.video.file_id,
             caption=message.caption,
             caption_entities=message.caption_entities,
-            message_thread_id=thread_id
+            message_thread_id=thread_id,
+            **reply_kwargs
         )
     elif message.document:
         return await bot.send_document(
@@ -41,7 +58,8 @@ async def send_message_by_type(bot, message, chat_id, thread_id=None, disable_we
             document=message.document.file_id,
             caption=message.caption,
             caption_entities=message.caption_entities,
-            message_thread_id=thread_id
+            message_thread_id=thread_id,
+            **reply_kwargs
         )
     elif message.audio:
         return await bot.send_audio(
@@ -49,7 +67,8 @@ async def send_message_by_type(bot, message, chat_id, thread_id=None, disable_we
             audio=message.audio.file_id,
             caption=message.caption,
             caption_entities=message.caption_entities,
-            message_thread_id=thread_id
+            message_thread_id=thread_id,
+            **reply_kwargs
         )
     elif message.voice:
         return await bot.send_voice(
@@ -57,19 +76,22 @@ async def send_message_by_type(bot, message, chat_id, thread_id=None, disable_we
             voice=message.voice.file_id,
             caption=message.caption,
             caption_entities=message.caption_entities,
-            message_thread_id=thread_id
+            message_thread_id=thread_id,
+            **reply_kwargs
         )
     elif message.video_note:
         return await bot.send_video_note(
             chat_id=chat_id,
             video_note=message.video_note.file_id,
-            message_thread_id=thread_id
+            message_thread_id=thread_id,
+            **reply_kwargs
         )
     elif message.sticker:
         return await bot.send_sticker(
             chat_id=chat_id,
             sticker=message.sticker.file_id,
-            message_thread_id=thread_id
+            message_thread_id=thread_id,
+            **reply_kwargs
         )
     return None
 
@@ -0,0 +1,66 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+def get_ordering_key(update: object):
+    if not isinstance(update, Update):
+        return None
+    chat = update.effective_chat
+    if chat is None:
+        user = update.effective_user
+        return ("user", user.id) if user else None
+    message = update.effective_message
+    if message is not None and message.is_topic_message:
+        return ("topic", chat.id, message.message_thread_id)
+    return ("chat", chat.id)
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_workers: int, max_pending_updates: int, ingress=None):
+        super().__init__(max(max_workers, max_pending_updates))
+        self.max_workers = max_workers
+        self.ingress = ingress
+        self._workers = asyncio.Semaphore(max_workers)
+        self._key_locks = {}
+
+    async def do_process_update(self, update, coroutine):
+        ticket = self.ingress.enter(update) if self.ingress else None
+        if ticket is not None and ticket.rejected:
+            coroutine.close()
+            await self.ingress.reject(update)
+            return
+
+        try:
+            await self._run_ordered(update, coroutine, ticket)
+        finally:
+            if ticket is not None:
+                self.ingress.leave(ticket)
+
+    async def _run(self, coroutine, ticket):
+        async with self._workers:
+            if ticket is not None:
+                self.ingress.mark_started(ticket)
+            await coroutine
+
+    async def _run_ordered(self, update, coroutine, ticket):
+        key = get_ordering_key(update)
+        if key is None:
+            await self._run(coroutine, ticket)
+            return
+
+        entry = self._key_locks.get(key)
+        if entry is None:
+            entry = self._key_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run(coroutine, ticket)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._key_locks.pop(key, None)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass